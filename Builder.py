@@ -1,37 +1,59 @@
+from functools import lru_cache
+
+import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 
 import chart_config as cc
 
 
-def build_line_chart(selected_countries, selected_indexes, merged_df):
+# colors of a freshly built line chart, by position in the selection
+def get_line_colors(selected_countries):
+    color_map = px.colors.qualitative.Plotly
+    return {country: color_map[i % len(color_map)] for i, country in enumerate(selected_countries)}
+
+# color of a country added to an existing line chart: the first one not used by the countries already shown
+def pick_line_color(used_colors):
+    color_map = px.colors.qualitative.Plotly
+    used_colors = list(used_colors)
+    free_colors = [color for color in color_map if color not in used_colors]
+    return free_colors[0] if free_colors else color_map[len(used_colors) % len(color_map)]
+
+# the traces of one country, one per selected index, in the order the line chart holds them
+def build_line_traces(country, color, selected_indexes, dh):
+    traces = []
+    # only the years where the country has every selected index, as the inner merge did
+    result = dh.query(selected_indexes, countries=[country])
+    x = result.years
+    values = result.values
+    if len(selected_indexes) > 0:
+        traces.append(go.Scatter(
+            x=x,
+            y=values[:, 0],
+            mode="lines+markers",
+            name=f"{country} - {cc.chart_config[selected_indexes[0]]["chart_name"]}",
+            yaxis="y1",
+            line=dict(width=2, color=color),
+            showlegend=True
+        ))
+    if len(selected_indexes) > 1:
+        traces.append(go.Scatter(
+            x=x,
+            y=values[:, 1],
+            mode="lines+markers",
+            name=f"{country} - {cc.chart_config[selected_indexes[1]]["chart_name"]}",
+            yaxis="y2",
+            line=dict(width=2, dash="dot", color=color),
+            showlegend=True
+        ))
+    return traces
+
+def build_line_chart(selected_countries, selected_indexes, dh, country_colors=None):
     fig = go.Figure()
     if len(selected_indexes) > 0:
-        color_map = px.colors.qualitative.Plotly
-        country_colors = {country: color_map[i % len(color_map)] for i, country in enumerate(selected_countries)}
+        country_colors = country_colors or get_line_colors(selected_countries)
         for country in selected_countries:
-            df_country = merged_df[merged_df["country"] == country].sort_values("year")
-            color = country_colors[country]
-            if len(selected_indexes) > 0:
-                fig.add_trace(go.Scatter(
-                    x=df_country["year"],
-                    y=df_country[selected_indexes[0]],
-                    mode="lines+markers",
-                    name=f"{country} - {cc.chart_config[selected_indexes[0]]["chart_name"]}",
-                    yaxis="y1",
-                    line=dict(width=2, color=color),
-                    showlegend=True
-                ))
-            if len(selected_indexes) > 1:
-                fig.add_trace(go.Scatter(
-                    x=df_country["year"],
-                    y=df_country[selected_indexes[1]],
-                    mode="lines+markers",
-                    name=f"{country} - {cc.chart_config[selected_indexes[1]]["chart_name"]}",
-                    yaxis="y2",
-                    line=dict(width=2, dash="dot", color=color),
-                    showlegend=True
-                ))
+            fig.add_traces(build_line_traces(country, country_colors[country], selected_indexes, dh))
 
         # dynamic title text
         title_text = cc.chart_config[selected_indexes[0]]["chart_name"]
@@ -84,14 +106,131 @@ def build_line_chart(selected_countries, selected_indexes, merged_df):
         )
     return fig
 
-def build_map_info(years = [], merged_df=[], selected_indexes=[]):
+# texts of the map which only depend on the selection: the title without the year and the hover template
+@lru_cache(maxsize=None)
+def get_map_texts(selected_indexes):
+    title_text = " & ".join(cc.chart_config[index]["chart_name"] for index in selected_indexes)
+
+    # the custom data holds the scores of the selected indexes followed by their raw values
+    hover_info = "Country: %{hovertext}<br>"
+    for i, index in enumerate(selected_indexes):
+        hover_info += cc.chart_config[index]["chart_name"] + " " + cc.chart_config[index]["hover_prefix"] + str(len(selected_indexes) + i) + cc.chart_config[index]["hover_suffix"]
+        hover_info += " (score %{customdata[" + str(i) + "]:.2f})<br>"
+    hover_info += "<extra></extra>"
+    return title_text, hover_info
+
+# legend of an index: the configured one under the default normalization, otherwise the scheme it is shown in
+def get_legend_name(dh, index):
+    if dh.normalization == "default":
+        return cc.chart_config[index]["legend_name"]
+    return f"{cc.chart_config[index]['chart_name']} [0 - 10] {dh.get_normalization(index)}"
+
+# arrays of the map over every year of the selection, built once per selection order and sliced per year
+def get_map_arrays(dh, selected_indexes):
+    view = dh.get_merged_view(selected_indexes)
+
+    def build():
+        # the view holds the columns in sorted index order
+        columns = [view.indexes.index(index) for index in selected_indexes]
+        # the map is located by ISO3 code, the hover shows the display name
+        locations = np.array(dh.all_country_iso3, dtype=object)[view.country_codes]
+        names = np.array(dh.all_countries, dtype=object)[view.country_codes]
+        # custom data only holds the scores and the raw values of the selected indexes, a float32 matrix which is
+        # sent as a binary typed array; the strings stay out of it: the names are the hover text and a click is
+        # resolved by its location
+        custom_data = np.ascontiguousarray(np.hstack([view.values[:, columns], view.raw_values[:, columns]]), dtype=np.float32)
+        return view, locations, names, custom_data
+    return view.memoize(tuple(selected_indexes), build)
+
+# the map frame of a single year, used for every frame of the animation and by the lazy map on demand
+# fixed_color_range: the color scale spans every year of the index instead of this year only, so frames compare
+def build_map_frame(year, dh, selected_indexes, fixed_color_range=False):
+    view, locations, names, custom_data = get_map_arrays(dh, selected_indexes)
+    title_text, hover_info = get_map_texts(tuple(selected_indexes))
+    # the countries having every selected index in this year
+    year_code = dh.year_codes[year]
+    rows = view.year_rows(year_code)
+    country_codes = view.country_codes[rows]
+    locations = locations[rows]
+    values = custom_data[rows]
+    data = []
+
+    # dynamic title text
+    title_text = f"{title_text} in {year}" if selected_indexes else ""
+
+    # first selected index on the map
+    if len(selected_indexes) > 0:
+        # the color range and the bubble sizes are the data handler's precomputed tables
+        zmin, zmax = dh.get_color_range(selected_indexes[0], None if fixed_color_range else year)
+        choropleth = go.Choropleth(
+            locations=locations,
+            z=values[:, 0],
+            locationmode="ISO-3",
+            zmin=zmin,
+            zmax=zmax,
+            colorscale=cc.chart_config[selected_indexes[0]]["color"] + "s",
+            marker_line_color="white",
+            marker_line_width=0.5,
+            hoverinfo="skip",
+            selected=dict(marker=dict(opacity=1)),
+            unselected=dict(marker=dict(opacity=1)),
+            showlegend=True,
+            showscale=False,
+            name = get_legend_name(dh, selected_indexes[0]),
+        )
+        data.append(choropleth)
+
+    # every other index as bubis bublé
+    for i in range(1, len(selected_indexes)):
+        bubbles = go.Scattergeo(
+            locations=locations,
+            locationmode="ISO-3",
+            mode="markers",
+            marker=dict(
+                size=dh.get_bubble_sizes(selected_indexes[i])[year_code, country_codes],
+                color=cc.chart_config[selected_indexes[i]]["color"],
+                opacity=0.5,
+                line=dict(width=0.7, color="white")
+            ),
+            hoverinfo="skip",
+            selected=dict(marker=dict(opacity=0.5)),
+            unselected=dict(marker=dict(opacity=0.5)),
+            name = get_legend_name(dh, selected_indexes[i]),
+            showlegend = True,
+        )
+        data.append(bubbles)
+
+    # an invisible marker per country so selection events are triggered reliably.
+    scatter_text = go.Scattergeo(
+        locations=locations,
+        locationmode="ISO-3",
+        mode="markers+text",
+        marker=dict(size=20, opacity=0),  # invisible but selectable
+        customdata=values,
+        hovertext=names[rows],
+        hovertemplate=hover_info, # also this invisible layer handles hoverinfo to make it consistent
+        selected=dict(marker=dict(opacity=0)),
+        unselected=dict(marker=dict(opacity=0)),
+        showlegend=False,
+    )
+    data.append(scatter_text)
+
+    return go.Frame(
+        data=data,
+        name=str(year),
+        layout=go.Layout(
+            title_text = title_text,
+        )
+    )
+
+def build_map_info(years = [], dh=None, selected_indexes=[], fixed_color_range=False):
     frames = []
     #building an empty frame for initial display
     if len(years) == 0:
         frames.append(go.Frame(
             data=[go.Scattergeo(
                 locations=[],
-                locationmode="country names",
+                locationmode="ISO-3",
                 showlegend=False,
                 hoverinfo="skip",
                 name=""
@@ -100,99 +239,15 @@ def build_map_info(years = [], merged_df=[], selected_indexes=[]):
                 title_text="",
             )
         ))
-    for year in years:
-        dff = merged_df[merged_df["year"] == year]
-        data = []
-
-        # dynamic title text
-        title_text = ''
-        for i in range(len(selected_indexes)):
-            title_text += cc.chart_config[selected_indexes[i]]["chart_name"]
-            if i != len(selected_indexes) - 1:
-                title_text += " & "
-            else:
-                title_text += f' in {year}'
-
-        # first selected index on the map
-        if len(selected_indexes) > 0 and selected_indexes[0] in dff.columns:
-            choropleth = go.Choropleth(
-                locations=dff["country"],
-                z=dff[selected_indexes[0]],
-                locationmode="country names",
-                zmin=dff[selected_indexes[0]].min(),
-                zmax=dff[selected_indexes[0]].max(),
-                colorscale=cc.chart_config[selected_indexes[0]]["color"] + "s",
-                marker_line_color="white",
-                marker_line_width=0.5,
-                hoverinfo="skip",
-                selected=dict(marker=dict(opacity=1)),
-                unselected=dict(marker=dict(opacity=1)),
-                showlegend=True,
-                showscale=False,
-                name = cc.chart_config[selected_indexes[0]]["legend_name"],
-            )
-            data.append(choropleth)
-
-        # every other index as bubis bublé
-        for i in range(1, len(selected_indexes)):
-            if selected_indexes[i] in dff.columns:
-                bubble_values = dff[selected_indexes[i]].fillna(0)
-
-                bubbles = go.Scattergeo(
-                    locations=dff["country"],
-                    locationmode="country names",
-                    mode="markers",
-                    marker=dict(
-                        size=(bubble_values * 3).tolist(),
-                        color=cc.chart_config[selected_indexes[i]]["color"],
-                        opacity=0.5,
-                        line=dict(width=0.7, color="white")
-                    ),
-                    hoverinfo="skip",
-                    selected=dict(marker=dict(opacity=0.5)),
-                    unselected=dict(marker=dict(opacity=0.5)),
-                    name = cc.chart_config[selected_indexes[i]]["legend_name"],
-                    showlegend = True,
-                )
-                data.append(bubbles)
-
-        #building custom data
-        custom_data = ["country"]
-        custom_data.extend(selected_indexes)
-
-        #building hover info
-        hover_info = "Country: %{customdata[0]}<br>"
-        for index in selected_indexes:
-            hover_info += cc.chart_config[index]["chart_name"] + " " + cc.chart_config[index]["hover_prefix"] + str(selected_indexes.index(index) + 1) + cc.chart_config[index]["hover_suffix"] + "<br>"
-        hover_info += "<extra></extra>"
-        # an invisible marker per country so selection events are triggered reliably.
-        scatter_text = go.Scattergeo(
-            locations=dff["country"],
-            locationmode="country names",
-            mode="markers+text",
-            marker=dict(size=20, opacity=0),  # invisible but selectable
-            customdata=dff[custom_data].values,
-            hovertemplate=hover_info, # also this invisible layer handles hoverinfo to make it consistent
-            selected=dict(marker=dict(opacity=0)),
-            unselected=dict(marker=dict(opacity=0)),
-            showlegend=False,
-        )
-        data.append(scatter_text)
-
-        frames.append(go.Frame(
-            data=data,
-            name=str(year),
-            layout=go.Layout(
-                title_text = title_text,
-            )
-        ))
+    frames.extend(build_map_frame(year, dh, selected_indexes, fixed_color_range) for year in years)
     return frames
 
 # initial map figure
-def build_map(frames, years=[]):
+# lazy: only the first frame is shipped, the year controls live outside the figure and fetch the other frames on demand
+def build_map(frames, years=[], lazy=False):
     return go.Figure(
         data= frames[0].data,
-        frames=frames,
+        frames=frames if not lazy else None,
         layout=go.Layout(
             title=frames[0].layout.title.text if frames else "",
             clickmode="event+select",
@@ -234,7 +289,7 @@ def build_map(frames, years=[]):
                                "transition": {"duration": 300}}]
                     )
                 ]
-            )] if years else [],
+            )] if years and not lazy else [],
             sliders=[dict(
                 active=0,
                 x=0.5,
@@ -248,7 +303,7 @@ def build_map(frames, years=[]):
                                         "mode": "immediate",
                                         "transition": {"duration": 200}}]
                 ) for year in years]
-            )] if years else [],
+            )] if years and not lazy else [],
             legend=dict(
                 title="Legend",
                 orientation="v",
@@ -263,21 +318,19 @@ def build_map(frames, years=[]):
         )
     )
 
-def build_bar_chart(selected_countries, year, all_indexes, merged_df):
+def build_bar_chart(selected_countries, year, all_indexes, dh):
     fig = go.Figure()
 
-    #selected_countries here is always 1 long
-    data = merged_df[
-        (merged_df["country"] == selected_countries[0]) &
-        (merged_df["year"] == year) ]
+    #selected_countries here is always 1 long, its values are a single row with any of the indexes
+    result = dh.query(all_indexes, countries=selected_countries[:1], years=[year], how="outer")
 
-    if data.empty:
+    if len(result) == 0:
         return go.Figure().update_layout(
             title=f"No data available for {selected_countries[0]} in {year}"
         )
 
     # Build bars for all indexes
-    y_values = [data[idx].values[0] if idx in data.columns else None for idx in all_indexes]
+    y_values = [None if np.isnan(value) else float(value) for value in result.values[0]]
     x_labels = [cc.chart_config[idx]["chart_name"] for idx in all_indexes]
 
     fig.add_trace(go.Bar(
@@ -1,171 +1,888 @@
+import hashlib
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+from functools import lru_cache, partial
+
 import numpy as np
 import pandas as pd
 from functools import reduce
 
+from Storage import AtomicFile, ByteLRU
+
+logger = logging.getLogger(__name__)
+
 class DataHandler:
-    def __init__(self):
+    # every index is loaded on first access, so a worker only pays for the indexes it actually serves
+    # check_sources=False serves a snapshot as it is, without comparing it to the source csvs (e.g. synthetic data)
+    # baseline_year: the year whose prices the nominal indexes (DEFLATED_INDEXES) are in, DEFAULT_BASELINE_YEAR by default
+    # normalization: the scheme (NORMALIZATION_SCHEMES) turning every index's raw values into scores,
+    # "default" is the scheme of each index in INDEX_NORMALIZATIONS
+    def __init__(self, cache_max_bytes=256 * 1024 * 1024, snapshot_path=None, check_sources=True, baseline_year=None, normalization=None):
         self.all_indexes = ["BMI", "DIIndex", "GDPValue", "GDPCapitaValue","HDIValue", "LifeExpectancy"]
-        self.data = {
-            "BMI": LoadBigMacIndex(),
-            "DIIndex": LoadDemocracyIndex(),
-            "GDPValue": LoadGDPCountry(),
-            "GDPCapitaValue": LoadGDPCapita(),
-            "HDIValue": LoadHDI(),
-            "LifeExpectancy": loadLifeExpectancy(),
-            "all": None
-        }
-        all_dfs = self.get_merged_df(df_names = self.all_indexes, how="outer")
-        self.data["all"] = all_dfs
-        self.all_year = sorted(all_dfs["year"].astype(int).unique())
+        self.index_codes = {name: i for i, name in enumerate(self.all_indexes)}
+        self.snapshot_path = snapshot_path or SNAPSHOT_PATH
+        self.check_sources = check_sources
+        self.baseline_year = baseline_year or DEFAULT_BASELINE_YEAR
+        self.normalization = normalization or "default"
+        if self.normalization != "default" and self.normalization not in NORMALIZATION_SCHEMES:
+            raise ValueError(f"unknown normalization {self.normalization}, one of {list(NORMALIZATION_SCHEMES)}")
+        # (baseline year, normalization) -> handler of this data version with those options, shared by all of them
+        self.variants = {(self.baseline_year, self.normalization): self}
+        # the scores by index (what the charts show), and the raw values (in baseline prices) with their statistics
+        self.data = {}
+        self.raw = {}
+        self.stats = {}
+        self.cube = None
+        self.lock = threading.RLock()
+        # server side cache of the merged views, the dcc.Store only carries the key
+        self.merged_cache = MergedDataCache(lambda df_names: MergedView(self, df_names), max_bytes=cache_max_bytes)
+
+    def load_axes(self):
+        # the country and year axes of the cube come from the snapshot, no index has to be read for them
+        if self.cube is not None:
+            return
+        with self.lock:
+            if self.cube is not None:
+                return
+            if self.check_sources:
+                UpdateSnapshot(self.all_indexes, self.snapshot_path)
+            iso3_codes, countries, years = ReadSnapshotAxes(self.snapshot_path)
+            # {index: source hash}, the version of the data every cached figure is keyed by
+            self.manifest = ReadSnapshotManifest(self.snapshot_path)
+            self.deflator = LoadDeflator()
+            # the frames are keyed by ISO3 code, the charts show the display name of the code
+            self.all_country_iso3 = iso3_codes
+            self.all_countries = countries
+            self.all_year = years
+            # the country dictionary shared by every frame, merges on country are joins of the integer codes
+            self.country_dtype = pd.CategoricalDtype(iso3_codes)
+            self.country_codes = {country: i for i, country in enumerate(countries)}
+            self.country_names = dict(zip(iso3_codes, countries))
+            # the axes as arrays, for gathering the labels of query results
+            self.country_array = np.array(countries, dtype=object)
+            self.year_array = np.array(years)
+            self.year_codes = {year: i for i, year in enumerate(years)}
+            # dense float32 cube of every index, indexed as cube[year code, country code, index code]
+            # year is the outer axis so the slice of one year (what a map frame needs) is a contiguous view
+            # the column of an index stays NaN until the index is loaded
+            # the map tables, filled per index on load as they only depend on the data:
+            # the color range of every index per year and over all years, and the bubble sizes in the cube's layout
+            self.year_min = np.full((len(years), len(self.all_indexes)), np.nan, dtype=np.float32)
+            self.year_max = np.full((len(years), len(self.all_indexes)), np.nan, dtype=np.float32)
+            self.index_min = np.full(len(self.all_indexes), np.nan, dtype=np.float32)
+            self.index_max = np.full(len(self.all_indexes), np.nan, dtype=np.float32)
+            self.bubble_sizes = np.zeros((len(years), len(countries), len(self.all_indexes)), dtype=np.float32)
+            # the raw values in the cube's layout, for the hovers and query(raw=True)
+            self.raw_cube = np.full((len(years), len(countries), len(self.all_indexes)), np.nan, dtype=np.float32)
+            self.cube = np.full((len(years), len(countries), len(self.all_indexes)), np.nan, dtype=np.float32)
+
+    def get_cube(self, df_names = []):
+        # the cube with (at least) the given indexes loaded
+        self.load_axes()
+        for name in df_names:
+            self.get_df_by_name(name)
+        return self.cube
 
     def get_merged_df(self, df_names = [], how="inner"):
         dfs_to_merge = [self.get_df_by_name(df_name) for df_name in df_names]
         return MergeDataFrames(dfs_to_merge, how=how)
 
+    def get_merged_key(self, df_names):
+        return MakeMergedKey(df_names)
+
+    def get_merged_view(self, key):
+        return self.merged_cache.get(key)
+
+    def precompute_merged_views(self, max_indexes, background=False):
+        # every selection of up to max_indexes indexes is built up front and pinned in the cache, so the
+        # dropdown never merges on the request path; with too many combinations they are built on demand instead
+        keys = [key for size in range(max_indexes + 1) for key in itertools.combinations(self.all_indexes, size)]
+        if len(keys) > PRECOMPUTE_MAX_VIEWS:
+            return None
+        if background:
+            thread = threading.Thread(target=self.merged_cache.pin, args=(keys,), name="precompute-merged-views", daemon=True)
+            thread.start()
+            return thread
+        self.merged_cache.pin(keys)
+
+    def get_data_version(self, df_names=None):
+        # hash of the sources of the given indexes (all of them by default), it changes whenever their data does
+        # the normalization of every index is part of it, the baseline year for the deflated indexes only
+        # the setting is kept next to the scheme it gives: the legends name an explicitly chosen scheme, so
+        # "default" and the same scheme chosen by name are different figures
+        self.load_axes()
+        names = sorted(self.all_indexes if df_names is None else df_names)
+        return hashlib.sha1("|".join(
+            f"{name}:{self.manifest.get(name)}#{self.normalization}/{self.get_normalization(name)}" + (f"@{self.baseline_year}" if name in DEFLATED_INDEXES else "")
+            for name in names
+        ).encode()).hexdigest()[:16]
+
+    def get_normalization(self, name):
+        # the scheme the scores of an index are computed with
+        return INDEX_NORMALIZATIONS[name] if self.normalization == "default" else self.normalization
+
+    def variant(self, baseline_year=None, normalization=None):
+        # this data version with another baseline year and/or normalization (None keeps this handler's one),
+        # built once per combination from what is already loaded: an index whose scores stay the same is taken
+        # over with its merged views, one whose scheme changes gets its scores computed again from the raw values
+        # and statistics, only the deflated indexes of a new baseline are read from the snapshot again
+        key = (baseline_year or self.baseline_year, normalization or self.normalization)
+        handler = self.variants.get(key)
+        if handler is not None:
+            return handler
+        self.load_axes()
+        self.deflator.get_factors(key[0]) # an unknown baseline fails here, before anything is built
+        with self.lock:
+            handler = self.variants.get(key)
+            if handler is None:
+                handler = DataHandler(cache_max_bytes=self.merged_cache.max_bytes, snapshot_path=self.snapshot_path, check_sources=False, baseline_year=key[0], normalization=key[1])
+                handler.load_axes()
+                # a snapshot rewritten in the meantime (hot reload) is not mixed into this version
+                changed = {name for name in self.all_indexes if handler.manifest.get(name) != self.manifest.get(name)}
+                if handler.baseline_year != self.baseline_year:
+                    changed.update(DEFLATED_INDEXES)
+                rescored = {name for name in self.all_indexes if handler.get_normalization(name) != self.get_normalization(name)}
+                handler.adopt(self, changed, rescored)
+                handler.variants = self.variants
+                self.variants[key] = handler
+        return handler
+
+    def get_baseline_years(self):
+        self.load_axes()
+        return self.deflator.years
+
+    def query(self, indexes, countries=None, years=None, how="inner", raw=False):
+        # the (country, year) rows of the given indexes, filtered before anything is joined:
+        # the filters become coordinates of the cube, so only the requested cells are gathered and checked
+        # inner: rows with every index, outer: rows with any of them; ordered by country then year
+        # raw: the raw values (in baseline prices) instead of the scores
+        cube = self.get_cube(indexes)
+        if raw:
+            cube = self.raw_cube
+        index_codes = [self.index_codes[name] for name in indexes]
+        if countries is None:
+            country_codes = np.arange(len(self.all_countries))
+        else:
+            country_codes = np.array([self.country_codes[country] for country in countries if country in self.country_codes], dtype=np.intp)
+        year_codes = self.get_year_codes(years)
+        # (country, year, index) block of the requested cells
+        if countries is None and years is None:
+            cells = cube[:, :, index_codes].transpose(1, 0, 2)
+        else:
+            cells = cube[np.ix_(year_codes, country_codes, index_codes)].transpose(1, 0, 2)
+        has_value = ~np.isnan(cells)
+        present = has_value.all(axis=2) if how == "inner" else has_value.any(axis=2)
+        if not index_codes:
+            present[:] = False
+        rows_country, rows_year = np.nonzero(present)
+        return QueryResult(
+            list(indexes),
+            self.country_array[country_codes[rows_country]],
+            self.year_array[year_codes[rows_year]],
+            cells[rows_country, rows_year],
+        )
+
+    def get_year_codes(self, years=None):
+        # codes of the requested years on the sorted year axis, a range is a contiguous slice found by binary search
+        self.load_axes()
+        if years is None:
+            return np.arange(len(self.all_year))
+        if isinstance(years, range) and years.step == 1:
+            return np.arange(np.searchsorted(self.all_year, years.start), np.searchsorted(self.all_year, years.stop))
+        return np.array([self.year_codes[year] for year in years if year in self.year_codes], dtype=np.intp)
+
+    def get_country_name(self, iso3_code):
+        self.load_axes()
+        return self.country_names.get(iso3_code)
+
+    def get_color_range(self, name, year=None):
+        # (min, max) of an index in a year, or over every year when year is None
+        self.get_cube([name])
+        code = self.index_codes[name]
+        if year is None:
+            return self.index_min[code], self.index_max[code]
+        return self.year_min[self.year_codes[year], code], self.year_max[self.year_codes[year], code]
+
+    def get_bubble_sizes(self, name):
+        # float32 marker sizes of an index, indexed as [year code, country code]
+        self.get_cube([name])
+        return self.bubble_sizes[:, :, self.index_codes[name]]
+
+    def get_value(self, country, year, name):
+        # O(1) lookup, NaN when there is no data
+        cube = self.get_cube([name])
+        if country not in self.country_codes or year not in self.year_codes:
+            return np.nan
+        return cube[self.year_codes[year], self.country_codes[country], self.index_codes[name]]
+
     def get_df_by_name(self, name):
-        return self.data[name]
+        df = self.data.get(name)
+        if df is not None:
+            return df
+        self.load_axes()
+        with self.lock:
+            # another thread may have loaded it while this one was waiting
+            if name not in self.data:
+                # the raw values and their statistics are read once, the scores are computed from them
+                raw = self.raw.get(name)
+                if raw is None:
+                    raw = self.raw[name] = self.read_raw(name)
+                    self.stats[name] = IndexStats(raw[name].to_numpy())
+                values = raw[name].to_numpy()
+                scores = NORMALIZATION_SCHEMES[self.get_normalization(name)](values.astype(np.float64), self.stats[name]).astype(np.float32)
+                df = raw.assign(**{name: scores})
+                # the category codes are the country codes of the cube
+                cells = (np.searchsorted(self.all_year, df["year"].to_numpy()), df["country"].cat.codes.to_numpy(), self.index_codes[name])
+                self.raw_cube[cells] = values
+                self.cube[cells] = scores
+                self.fill_map_tables(name)
+                self.data[name] = df
+            return self.data[name]
+
+    def read_raw(self, name):
+        # the raw float32 values of an index, the snapshot holds the nominal ones of the deflated indexes
+        df = ReadSnapshotIndex(name, self.snapshot_path, country_dtype=self.country_dtype)
+        if name in DEFLATED_INDEXES:
+            df[name] = self.deflator.deflate(df[name].to_numpy(), df["year"].to_numpy(), self.baseline_year).astype(np.float32)
+        return df
+
+    def fill_map_tables(self, name):
+        code = self.index_codes[name]
+        column = self.cube[:, :, code]
+        # fmin/fmax skip the NaN of the countries without data, a year without any data stays NaN
+        # infinite values would make the range useless and are no valid marker size, they are skipped as well
+        finite = np.where(np.isfinite(column), column, np.nan)
+        self.year_min[:, code] = np.fmin.reduce(finite, axis=1)
+        self.year_max[:, code] = np.fmax.reduce(finite, axis=1)
+        self.index_min[code] = np.fmin.reduce(self.year_min[:, code])
+        self.index_max[code] = np.fmax.reduce(self.year_max[:, code])
+        # plotly rejects negative sizes, a score below 0 (a log scaled value under its unit) is no bubble
+        self.bubble_sizes[:, :, code] = np.clip(np.nan_to_num(finite), 0, None) * 3
+
+    def adopt(self, old, changed, rescored=()):
+        # a new version of the data takes over what did not change from the version it replaces:
+        # the loaded indexes with their cube columns and map tables, and the merged views of the unchanged indexes
+        # of the rescored indexes (same raw values, other scores) only the raw values and statistics are taken over
+        self.load_axes()
+        old.load_axes()
+        if (self.all_country_iso3, self.all_countries, self.all_year) != (old.all_country_iso3, old.all_countries, old.all_year):
+            # the cube coordinates moved, every index is read again
+            return
+        with old.lock:
+            names = [name for name in old.data if name not in changed]
+        with self.lock:
+            for name in names:
+                if name in self.data or name in self.raw:
+                    continue
+                self.raw[name] = old.raw[name]
+                self.stats[name] = old.stats[name]
+                if name in rescored:
+                    continue
+                code = self.index_codes[name]
+                self.raw_cube[:, :, code] = old.raw_cube[:, :, code]
+                self.cube[:, :, code] = old.cube[:, :, code]
+                self.year_min[:, code] = old.year_min[:, code]
+                self.year_max[:, code] = old.year_max[:, code]
+                self.index_min[code] = old.index_min[code]
+                self.index_max[code] = old.index_max[code]
+                self.bubble_sizes[:, :, code] = old.bubble_sizes[:, :, code]
+                self.data[name] = old.data[name]
+        self.merged_cache.adopt(old.merged_cache, lambda key: not set(changed).union(rescored).intersection(key))
+
+    def preload(self):
+        # loads every index up front, e.g. in a preforking server's master so the workers share the pages
+        self.get_cube(self.all_indexes)
+
+    def is_loaded(self):
+        return all(name in self.data for name in self.all_indexes)
 
     def get_all_indexes(self):
         return self.all_indexes
 
     def get_all_years(self):
+        self.load_axes()
         return self.all_year
 
+# the data handler shared by every callback of the process
+data_handler = None
+data_handler_lock = threading.Lock()
+
+def GetDataHandler():
+    global data_handler
+    if data_handler is None:
+        with data_handler_lock:
+            if data_handler is None:
+                data_handler = DataHandler()
+    return data_handler
+
+def PublishDataHandler(new):
+    # the pointer swap: a callback which already holds the old version finishes on it, later ones get the new one
+    global data_handler
+    with data_handler_lock:
+        data_handler = new
+
+def ReloadDataHandler(old, max_indexes=None):
+    # the next version of the data, fully loaded next to the old one which keeps serving meanwhile
+    # the snapshot is brought up to date first, which only re-parses the indexes whose source changed
+    # returns (new handler, changed indexes), the old handler itself when nothing changed
+    old.load_axes()
+    new = DataHandler(cache_max_bytes=old.merged_cache.max_bytes, snapshot_path=old.snapshot_path, check_sources=old.check_sources, baseline_year=old.baseline_year, normalization=old.normalization)
+    new.load_axes()
+    changed = [name for name in new.all_indexes if new.manifest.get(name) != old.manifest.get(name)]
+    if not changed:
+        return old, changed
+    new.adopt(old, changed)
+    new.preload()
+    if max_indexes is not None:
+        new.precompute_merged_views(max_indexes)
+    return new, changed
+
+def StatSources():
+    # (modification time, size) of every source file, None for a missing one
+    stats = {}
+    for path in sorted({file for name in INDEX_SOURCES for file in IndexFiles(name)} | set(COUNTRY_INDEX_FILES)):
+        try:
+            stat = os.stat(path)
+            stats[path] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stats[path] = None
+    return stats
+
+class SourceWatcher(threading.Thread):
+    # polls the source files and publishes a new version of the data when one of them changed
+    # a handful of stat calls per interval needs no platform specific notification api (inotify) and also
+    # works on network and container mounts, under gunicorn every worker runs its own watcher
+    def __init__(self, interval=5.0, max_indexes=None):
+        super().__init__(name="source-watcher", daemon=True)
+        self.interval = interval
+        self.max_indexes = max_indexes
+        self.stopped = threading.Event()
+        self.stats = StatSources()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            stats = StatSources()
+            if stats != self.stats:
+                self.reload(stats)
+
+    def reload(self, stats):
+        changed_files = {path for path in stats if stats[path] != self.stats.get(path)}
+        if changed_files.intersection(COUNTRY_INDEX_FILES):
+            ClearCountryIndex()
+        if CPI_PATH in changed_files:
+            LoadDeflator.cache_clear()
+        try:
+            new, changed = ReloadDataHandler(GetDataHandler(), self.max_indexes)
+        except Exception:
+            # e.g. a file caught in the middle of being written, the stats are kept so the next poll tries again
+            logger.exception("reloading the data after a change of %s failed", sorted(changed_files))
+            return
+        self.stats = stats
+        if changed:
+            PublishDataHandler(new)
+            logger.info("published a new data version, changed indexes: %s", changed)
+
+    def stop(self):
+        self.stopped.set()
+
+
+# rows per chunk of the streaming ingest, a loader's peak memory is bounded by this instead of the file size
+CHUNK_SIZE = 20_000
+# years before this are dropped while reading
+FIRST_YEAR = 2000
+
+def ReadCsvChunks(path, columns, dtype=None, chunksize=CHUNK_SIZE):
+    # only the needed columns are parsed, with pinned compact dtypes
+    return pd.read_csv(path, usecols=columns, dtype=dtype, chunksize=chunksize)
+
+def ReadWideCsvChunks(path, id_columns, chunksize=CHUNK_SIZE):
+    # wide tables (one column per year): only the wanted year columns are read and every chunk is melted on its own
+    header = pd.read_csv(path, nrows=0).columns
+    year_columns = [col for col in header if col.strip().isdigit() and int(col) >= FIRST_YEAR]
+    for chunk in ReadCsvChunks(path, [*id_columns, *year_columns], dtype={col: np.float32 for col in year_columns}, chunksize=chunksize):
+        chunk = chunk.melt(id_vars=id_columns, var_name="year", value_name="value")
+        yield chunk.dropna(subset=["value"])
+
+# sources carrying an ISO3 code next to the country name: (file, name column, code column)
+# in order of preference for the display name of a code
+COUNTRY_CODE_SOURCES = [
+    ("life-expectancy-unwpp.csv", "Entity", "Code"),
+    ("hdr-data.csv", "country", "countryIsoCode"),
+    ("DemocracyIndex.csv", "REF_AREA_LABEL", "REF_AREA"),
+    ("GDPCapita.csv", "Country Name", "Country Code"),
+]
+# names used by the sources without codes which none of the sources above spells the same way
+COUNTRY_ALIASES = {
+    "DR Congo": "COD",
+    "Federated States of Micronesia": "FSM",
+    "Ivory Coast": "CIV",
+    "Macau": "MAC",
+    "Republic of the Congo": "COG",
+    "São Tomé and Príncipe": "STP",
+}
+
+def IsIso3(codes):
+    return codes.astype("str").str.fullmatch("[A-Z]{3}")
+
+@lru_cache(maxsize=None)
+def LoadCountryIndex():
+    # alias -> ISO3 code and ISO3 code -> display name, built once from every name/code pair of the sources
+    aliases = {}
+    names = {}
+    for path, name_column, code_column in COUNTRY_CODE_SOURCES:
+        pairs = pd.read_csv(path, usecols=[name_column, code_column]).drop_duplicates()
+        # codes like OWID_WRL or the numeric regions are not ISO3, those names are resolved by the other sources
+        pairs = pairs[IsIso3(pairs[code_column])]
+        for name, code in zip(pairs[name_column], pairs[code_column]):
+            aliases.setdefault(name, code)
+            aliases.setdefault(code, code)
+            names.setdefault(code, name)
+    aliases.update(COUNTRY_ALIASES)
+    return aliases, names
+
+def ResolveCountries(names, codes=None):
+    # ISO3 code of every row: the row's own code when it is a valid one, otherwise the alias of its name
+    # rows which cannot be resolved (historical states, regions without a code) are None
+    aliases, _ = LoadCountryIndex()
+    resolved = names.map(aliases)
+    if codes is not None:
+        resolved = codes.where(IsIso3(codes), resolved)
+    return resolved
+
+def CompactFrame(chunks, name):
+    # the filtered chunks in the long format: categorical ISO3 country, int16 year, float32 value
+    df = pd.concat(list(chunks), ignore_index=True)
+    df = df[df["country"].notna()]
+    return pd.DataFrame({
+        "country": df["country"].astype("category"),
+        "year": df["year"].astype(np.int16),
+        name: df[name].astype(np.float32),
+    })
 
 def LoadDemocracyIndex():
-    df = pd.read_csv("DemocracyIndex.csv")
-    df = df.rename(columns={"REF_AREA_LABEL": "country", "OBS_VALUE": "DIIndex", "TIME_PERIOD": "year"})
-    return df[['country', 'year',"DIIndex"]]
+    # only 3 of the 36 columns are used
+    chunks = ReadCsvChunks("DemocracyIndex.csv", ["REF_AREA", "REF_AREA_LABEL", "TIME_PERIOD", "OBS_VALUE"], dtype={"OBS_VALUE": np.float32})
+    return CompactFrame((
+        chunk.assign(country=ResolveCountries(chunk["REF_AREA_LABEL"], chunk["REF_AREA"])).rename(columns={"OBS_VALUE": "DIIndex", "TIME_PERIOD": "year"})
+        for chunk in chunks
+    ), "DIIndex")
 
 def LoadBigMacIndex():
-    #Calculate prices after inflation
-    df = pd.read_csv("BigmacPrice.csv")
-    df = df.rename(columns={"name": "country", "dollar_price": "price"})
-    df["year"] = pd.to_datetime(df["date"]).dt.year
-    df = df.groupby(["country", "year"], as_index=False)["price"].mean()
-
-    cpi_data = {
-        'year': [
-            2000, 2001, 2002, 2003, 2004, 2005, 2006, 2007,
-            2008, 2009, 2010, 2011, 2012, 2013, 2014, 2015, 2016,
-            2017, 2018, 2019, 2020, 2021, 2022, 2023, 2024
-        ],
-        'avg_cpi': [
-            195.3, 201.6, 207.3, 215.3, 214.5, 218.1, 224.9, 229.6,
-            233.0, 237.0, 240.0, 245.1, 251.1, 255.7, 258.8, 264.9, 
-            271.0, 276.7,281.9, 287.5, 292.7, 296.8, 300.8, 306.0, 313.7
-        ]
-    }
-
-    cpi_df = pd.DataFrame(cpi_data)
-
-    cpi_map = dict(zip(cpi_df['year'], cpi_df['avg_cpi']))
-
-    cpi_2024 = cpi_map[2024] #using 2024 as baseline for inflation
-
-    df['cpi_for_year'] = df['year'].map(cpi_map)
-    df['inflation_multiplier'] = cpi_2024 / df['cpi_for_year']
-
-    df['BMI'] = df['price'] * df['inflation_multiplier']
-
-    df["BMI"] = 10 * (np.log(df["BMI"]) / np.log(df["BMI"]).max())
-
-    return df[["country", "year", "BMI"]]
+    # the yearly mean dollar price, summed up chunk by chunk
+    # the price is nominal, it is adjusted for inflation and scaled when the index is loaded (see DEFLATED_INDEXES)
+    sums = []
+    for chunk in ReadCsvChunks("BigmacPrice.csv", ["date", "name", "dollar_price"], dtype={"dollar_price": np.float32}):
+        chunk = chunk.rename(columns={"dollar_price": "price"})
+        chunk["country"] = ResolveCountries(chunk["name"])
+        chunk["year"] = pd.to_datetime(chunk["date"]).dt.year
+        sums.append(chunk.groupby(["country", "year"])["price"].agg(["sum", "count"]))
+    df = pd.concat(sums).groupby(level=["country", "year"]).sum()
+    df["BMI"] = df["sum"] / df["count"]
+    return CompactFrame([df.reset_index()], "BMI")
 
 def LoadGDPCountry():
-    df = pd.read_csv("GDP.csv")
-
-    # Melt the dataframe — convert year columns into rows to convert from wide format to long format
-    df = df.melt(id_vars=["Country"],
-                    var_name="year", 
-                    value_name="Value")
+    # the year columns are melted into rows chunk by chunk, years before 2000 are never read
+    # GDP.csv only has names, they are resolved through the country index
+    chunks = ReadWideCsvChunks("GDP.csv", ["Country"])
+    df = CompactFrame((chunk.assign(country=ResolveCountries(chunk["Country"])).rename(columns={"value": "GDPValue"}) for chunk in chunks), "GDPValue")
 
-    df["year"] = pd.to_numeric(df["year"], errors="coerce").astype("Int64")
-    df = df.dropna(subset=["Value"])
-
-    # Filter out values before 2000
-    df = df[df["year"] >= 2000]
-
-    df.rename(columns={"Country": "country", "Value": "GDPValue"}, inplace=True)
-    df['GDPValue'] = pd.to_numeric(df['GDPValue'], errors='coerce')
-
-    df = df.sort_values(["country", "year"]).reset_index(drop=True)
-    df["GDPValue"] = 10 * (np.log(df["GDPValue"]) / np.log(df["GDPValue"]).max()) # map the values between 0 and 10
-    return df
+    # the nominal GDP, adjusted for inflation and scaled when the index is loaded
+    return df.sort_values(["country", "year"]).reset_index(drop=True)
 
 def LoadGDPCapita():
-    # Read the dataset
-    df = pd.read_csv("GDPCapita.csv")
-
-    # Strip column names just in case
-    df.columns = df.columns.str.strip()
+    # the year columns are melted into rows chunk by chunk, years before 2000 are never read
+    chunks = ReadWideCsvChunks("GDPCapita.csv", ["Country Name", "Country Code"])
+    df = CompactFrame((
+        chunk.assign(country=ResolveCountries(chunk["Country Name"], chunk["Country Code"])).rename(columns={"value": "GDPCapitaValue"})
+        for chunk in chunks
+    ), "GDPCapitaValue")
 
-    # Identify year columns (numeric column names)
-    year_cols = [col for col in df.columns if col.isdigit()]
-
-    # Melt into long format
-    df = df.melt(
-        id_vars=['Country Name', 'Country Code', 'Indicator Name', 'Indicator Code'],
-        value_vars=year_cols,
-        var_name='year',
-        value_name='value'
-    )
-
-    # Convert year to integer and value to numeric
-    df['year'] = pd.to_numeric(df['year'], errors='coerce').astype('Int64')
-    df['value'] = pd.to_numeric(df['value'], errors='coerce')
-    df = df.dropna(subset=['value'])
-
-    df = df[df["year"] >= 2000]
-    df.rename(columns={"Country Name": "country", "value": "GDPCapitaValue"}, inplace=True)
-
-    df = df.sort_values(["country", "year"]).reset_index(drop=True)
-
-    df["GDPCapitaValue"] = 10 * (np.log(df["GDPCapitaValue"]) / np.log(df["GDPCapitaValue"]).max()) # map the values between 0 and 10
-
-    return df
+    # the nominal GDP per capita, adjusted for inflation and scaled when the index is loaded
+    return df.sort_values(["country", "year"]).reset_index(drop=True)
 
 def LoadHDI():
-    df = pd.read_csv("hdr-data.csv")
-
-    # Standardize column names
-    df = df.rename(columns={
-        "country": "country",
-        "year": "year",
-        "value": "HDIValue"
-    })
-
-    # Keep only needed columns and filter years
-    df = df[["country", "year", "HDIValue"]]
-    df = df[df["year"] >= 2000]
-
-    # Ensure correct types
-    df["year"] = pd.to_numeric(df["year"], errors="coerce").astype("Int64")
-    df = df.dropna(subset=["HDIValue"])
-
-    max_val = df["HDIValue"].max()
-    df["HDIValue"] = 10 * (df["HDIValue"] / max_val)
-    return df
+    # rows before 2000 and without a value are dropped chunk by chunk
+    chunks = (
+        chunk[(chunk["year"] >= FIRST_YEAR) & chunk["value"].notna()]
+            .assign(country=lambda chunk: ResolveCountries(chunk["country"], chunk["countryIsoCode"]))
+            .rename(columns={"value": "HDIValue"})
+        for chunk in ReadCsvChunks("hdr-data.csv", ["countryIsoCode", "country", "year", "value"], dtype={"year": np.int16, "value": np.float32})
+    )
+    return CompactFrame(chunks, "HDIValue")
 
 def loadLifeExpectancy():
-    df = pd.read_csv("life-expectancy-unwpp.csv")
-
-    # Standardize column names
-    df = df.rename(columns={
-        "Entity": "country", 
-        "Year": "year", 
-        "Life expectancy - Sex: all - Age: 0 - Variant: estimates": "LifeExpectancy"})
-    
-    # Keep only needed columns and filter years
-    df = df[["country", "year", "LifeExpectancy"]]
-    df = df[df["year"] >= 2000]
-    df = df.dropna(subset=["LifeExpectancy"])
-
-    min_val = df["LifeExpectancy"].min()
-    max_val = df["LifeExpectancy"].max()
+    # rows before 2000 and without a value are dropped chunk by chunk
+    value_column = "Life expectancy - Sex: all - Age: 0 - Variant: estimates"
+    chunks = (
+        chunk[(chunk["Year"] >= FIRST_YEAR) & chunk[value_column].notna()]
+            .assign(country=lambda chunk: ResolveCountries(chunk["Entity"], chunk["Code"]))
+            .rename(columns={"Year": "year", value_column: "LifeExpectancy"})
+        for chunk in ReadCsvChunks("life-expectancy-unwpp.csv", ["Entity", "Code", "Year", value_column], dtype={"Year": np.int16, value_column: np.float32})
+    )
+    return CompactFrame(chunks, "LifeExpectancy")
+
+# index -> (loader, source file), every loader returns the long format: country (ISO3), year, <index>
+INDEX_SOURCES = {
+    "BMI": (LoadBigMacIndex, "BigmacPrice.csv"),
+    "DIIndex": (LoadDemocracyIndex, "DemocracyIndex.csv"),
+    "GDPValue": (LoadGDPCountry, "GDP.csv"),
+    "GDPCapitaValue": (LoadGDPCapita, "GDPCapita.csv"),
+    "HDIValue": (LoadHDI, "hdr-data.csv"),
+    "LifeExpectancy": (loadLifeExpectancy, "life-expectancy-unwpp.csv"),
+}
+# the sources of the country index, every index is keyed through it
+COUNTRY_INDEX_FILES = [path for path, _, _ in COUNTRY_CODE_SOURCES]
+
+# yearly average CPI (year, cpi), the nominal indexes are deflated with it
+CPI_PATH = "CPI.csv"
+# the year whose prices the nominal indexes are shown in unless another one is chosen
+DEFAULT_BASELINE_YEAR = 2024
+# indexes stored in nominal money: the snapshot keeps the nominal values, they are deflated to the baseline
+# year when loaded, so a new baseline never runs a loader again
+DEFLATED_INDEXES = ["BMI", "GDPValue", "GDPCapitaValue"]
+
+def IndexFiles(name):
+    # the files an index's data depends on, the CPI series is one for the deflated indexes:
+    # it is part of their hash so the data version (and the hot reload) follows a change of it
+    return [INDEX_SOURCES[name][1], *([CPI_PATH] if name in DEFLATED_INDEXES else [])]
+
+class Deflator:
+    # a CPI series as an array indexed by year offset (year - first year), the multipliers that turn nominal
+    # values into prices of a baseline year are one array per baseline, built once
+    def __init__(self, years, cpi):
+        order = np.argsort(years)
+        years = np.asarray(years, dtype=np.int64)[order]
+        self.first_year = int(years[0])
+        self.years = list(range(self.first_year, int(years[-1]) + 1))
+        # a year missing inside the series is interpolated between its neighbours
+        self.cpi = np.interp(self.years, years, np.asarray(cpi, dtype=np.float64)[order])
+        self.factors = {} # baseline year -> multiplier per year offset
+
+    def get_factors(self, baseline_year):
+        factors = self.factors.get(baseline_year)
+        if factors is None:
+            if not self.first_year <= baseline_year <= self.years[-1]:
+                raise ValueError(f"no CPI for the baseline year {baseline_year}, the series covers {self.first_year}-{self.years[-1]}")
+            factors = self.factors[baseline_year] = self.cpi[baseline_year - self.first_year] / self.cpi
+        return factors
+
+    def deflate(self, values, years, baseline_year):
+        # a single gather of the multipliers by year offset
+        # years outside the series take the multiplier of the closest year instead of becoming NaN
+        offsets = np.clip(np.asarray(years, dtype=np.int64) - self.first_year, 0, len(self.cpi) - 1)
+        return values * self.get_factors(baseline_year)[offsets]
+
+@lru_cache(maxsize=None)
+def LoadDeflator(path=CPI_PATH):
+    cpi = pd.read_csv(path, dtype={"year": np.int64, "cpi": np.float64})
+    return Deflator(cpi["year"].to_numpy(), cpi["cpi"].to_numpy())
+
+# the loaders return raw values, the scores the charts show are computed when an index is loaded:
+# a normalization scheme maps the raw values (float64) with the statistics of the whole index to about 0 - 10
+class IndexStats:
+    # statistics of an index's raw values over every country and year, computed once per index and shared
+    # by every scheme; infinite values are left out like the NaN of the missing cells
+    def __init__(self, values):
+        self.sorted = np.sort(values[np.isfinite(values)].astype(np.float64))
+        self.min = self.sorted[0] if self.sorted.size else np.nan
+        self.max = self.sorted[-1] if self.sorted.size else np.nan
+        positive = self.sorted[self.sorted > 0]
+        self.min_positive = positive[0] if positive.size else np.nan
+        self.mean = self.sorted.mean() if self.sorted.size else np.nan
+        self.std = self.sorted.std() if self.sorted.size else np.nan
+
+def IdentityScale(values, stats):
+    # for the indexes already on a 0 - 10 scale
+    return values
+
+def MaxScale(values, stats):
+    return 10 * values / stats.max
+
+def LogMaxScale(values, stats):
+    # log of the values scaled so the highest one is 10, for values spanning orders of magnitude
+    # relative to 1 for money, where every value is above it; values below 1 (HDI, or the 0 - 10 indexes when
+    # chosen in the dropdown) are taken relative to the smallest positive value instead, so no score is negative
+    # a value of 0 or below has no log, it is missing (NaN) like a cell without data rather than -inf
+    unit = min(1, stats.min_positive)
+    positive = np.where(values > 0, values, np.nan)
+    return 10 * np.log(positive / unit) / np.log(stats.max / unit)
+
+def MinMaxScale(values, stats):
+    # onto 1 - 10, a 0 would give the lowest country an invisible bubble
+    return 1 + 9 * (values - stats.min) / (stats.max - stats.min)
+
+def ZScoreScale(values, stats):
+    # the standard score around 5, three standard deviations reach 0 and 10 (clipped beyond)
+    return np.clip(5 + 5 * (values - stats.mean) / (3 * stats.std), 0, 10)
+
+def PercentileScale(values, stats):
+    # the share of the values at or below the value, times 10
+    return 10 * np.searchsorted(stats.sorted, values, side="right") / max(stats.sorted.size, 1)
+
+NORMALIZATION_SCHEMES = {
+    "identity": IdentityScale,
+    "max": MaxScale,
+    "log-max": LogMaxScale,
+    "min-max": MinMaxScale,
+    "z-score": ZScoreScale,
+    "percentile": PercentileScale,
+}
+# the scheme of each index under the "default" normalization, what every loader used to apply itself
+INDEX_NORMALIZATIONS = {
+    "BMI": "log-max",
+    "DIIndex": "identity",
+    "GDPValue": "log-max",
+    "GDPCapitaValue": "log-max",
+    "HDIValue": "max",
+    "LifeExpectancy": "min-max",
+}
+
+SNAPSHOT_PATH = "data_snapshot.npz"
+# bump whenever a loader or the snapshot layout changes so old snapshots get rebuilt
+SNAPSHOT_VERSION = 8
+
+def HashSource(paths):
+    # the files of an index and the country index the rows are keyed through: an edit of another source
+    # only changes this index's hash when it changes a name -> code pair, not on every value it touches
+    digest = hashlib.sha1(str(SNAPSHOT_VERSION).encode())
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    digest.update(HashCountryIndex().encode())
+    return digest.hexdigest()
+
+@lru_cache(maxsize=None)
+def HashCountryIndex():
+    return hashlib.sha1(json.dumps(LoadCountryIndex(), sort_keys=True).encode()).hexdigest()
+
+def ClearCountryIndex():
+    # the country index is read again on next use, after one of its sources changed
+    LoadCountryIndex.cache_clear()
+    HashCountryIndex.cache_clear()
+
+def ReadSnapshotManifest(path=SNAPSHOT_PATH):
+    # {index: source hash} of the snapshot, empty when there is no usable snapshot
+    if not os.path.exists(path):
+        return {}
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            if "axes.countries" not in npz.files:
+                return {}
+            return json.loads(str(npz["manifest"]))
+    except (OSError, ValueError, KeyError):
+        # a broken snapshot is simply rebuilt from the sources
+        return {}
+
+def ReadSnapshotAxes(path=SNAPSHOT_PATH):
+    # the sorted ISO3 codes with their display names and the sorted years over every index
+    with np.load(path, allow_pickle=False) as npz:
+        return npz["axes.iso3"].tolist(), npz["axes.countries"].tolist(), npz["axes.year"].tolist()
+
+def ReadSnapshotIndex(name, path=SNAPSHOT_PATH, npz=None, country_dtype=None):
+    # npz members are read on access, so only the arrays of this index are loaded
+    if npz is None:
+        with np.load(path, allow_pickle=False) as npz:
+            return ReadSnapshotIndex(name, path, npz, country_dtype)
+    if country_dtype is None:
+        country_dtype = pd.CategoricalDtype(npz["axes.iso3"].tolist())
+    # the codes point into the shared country dictionary, no country string is materialized
+    return pd.DataFrame({
+        "country": pd.Categorical.from_codes(npz[f"{name}.country_codes"], dtype=country_dtype),
+        "year": npz[f"{name}.year"],
+        name: npz[f"{name}.value"],
+    })
 
-    df["LifeExpectancy"] = 1 + 9 * (df["LifeExpectancy"] - min_val) / (max_val - min_val)
-    return df
+def ReadSnapshot(path=SNAPSHOT_PATH):
+    # returns {index: (source hash, frame)} for every index stored in the snapshot
+    manifest = ReadSnapshotManifest(path)
+    if not manifest:
+        return {}
+    with np.load(path, allow_pickle=False) as npz:
+        country_dtype = pd.CategoricalDtype(npz["axes.iso3"].tolist())
+        return {name: (source_hash, ReadSnapshotIndex(name, path, npz, country_dtype)) for name, source_hash in manifest.items()}
+
+def WriteSnapshot(entries, path=SNAPSHOT_PATH, country_names=None):
+    arrays = {"manifest": np.array(json.dumps({name: source_hash for name, (source_hash, _) in entries.items()}))}
+    # one country dictionary for every index, the indexes only store codes into it
+    countries = sorted(set().union(*(df["country"] for _, df in entries.values())))
+    arrays["axes.iso3"] = np.array(countries, dtype=str)
+    arrays["axes.countries"] = np.array(DisplayNames(countries, country_names or {}), dtype=str)
+    arrays["axes.year"] = np.array(sorted(set().union(*(df["year"] for _, df in entries.values()))), dtype=np.int64)
+    country_index = pd.Index(countries)
+    for name, (_, df) in entries.items():
+        arrays[f"{name}.country_codes"] = country_index.get_indexer(df["country"]).astype(np.int32)
+        arrays[f"{name}.year"] = df["year"].to_numpy(dtype=np.int16)
+        arrays[f"{name}.value"] = df[name].to_numpy(dtype=np.float32)
+
+    with AtomicFile(path) as f:
+        np.savez(f, **arrays)
+
+def UpdateSnapshot(names, path=SNAPSHOT_PATH):
+    # re-parses only the indexes whose source changed since the snapshot was written
+    manifest = ReadSnapshotManifest(path)
+    source_hashes = {name: HashSource(IndexFiles(name)) for name in names}
+    stale = [name for name in names if manifest.get(name) != source_hashes[name]]
+    if not stale:
+        return
+    entries = ReadSnapshot(path)
+    for name in stale:
+        loader, _ = INDEX_SOURCES[name]
+        df = loader()[["country", "year", name]].reset_index(drop=True)
+        entries[name] = (source_hashes[name], df)
+    WriteSnapshot(entries, path, LoadCountryIndex()[1])
+
+def DisplayNames(codes, country_names):
+    # one unique display name per code, falling back to the code itself
+    names = [country_names.get(code, code) for code in codes]
+    duplicates = {name for name in names if names.count(name) > 1}
+    return [f"{name} ({code})" if name in duplicates else name for name, code in zip(names, codes)]
+
+def LoadIndexes(names, path=SNAPSHOT_PATH):
+    UpdateSnapshot(names, path)
+    with np.load(path, allow_pickle=False) as npz:
+        return {name: ReadSnapshotIndex(name, path, npz) for name in names}
+
+# above this many index combinations the merged views are built on demand and kept in the LRU cache
+# (2 of the 6 indexes: 1 empty + 6 single + 15 pairs = 22 views)
+PRECOMPUTE_MAX_VIEWS = 32
+
+def MakeMergedKey(df_names):
+    # the merge result does not depend on the selection order, so the key is the sorted selection
+    return tuple(sorted(df_names or []))
+
+class MergedView:
+    # the inner merge of a set of indexes in cube form: which (year, country) cells have every index
+    def __init__(self, dh, df_names):
+        cube = dh.get_cube(df_names)
+        codes = [dh.index_codes[name] for name in df_names]
+        if codes:
+            self.mask = ~np.isnan(cube[:, :, codes]).any(axis=2)
+        else:
+            self.mask = np.zeros(cube.shape[:2], dtype=bool)
+        self.indexes = list(df_names)
+        self.year_codes = np.flatnonzero(self.mask.any(axis=1))
+        self.years = [dh.all_year[code] for code in self.year_codes]
+
+        # every cell of the merge gathered in one pass, ordered by year then country
+        # the rows of year code y are rows offsets[y]:offsets[y + 1]
+        row_year_codes, self.country_codes = np.nonzero(self.mask)
+        self.values = cube[row_year_codes, self.country_codes][:, codes]
+        self.raw_values = dh.raw_cube[row_year_codes, self.country_codes][:, codes]
+        self.offsets = np.concatenate([[0], np.cumsum(self.mask.sum(axis=1))])
+        # per selection order memo of the builders (see memoize), lives and gets evicted with the view
+        self.memo = {}
+        # set by the cache holding the view, told the bytes the memo adds to the view
+        self.on_resize = None
+        self.nbytes = self.mask.nbytes + self.year_codes.nbytes + self.country_codes.nbytes + self.values.nbytes + self.raw_values.nbytes + self.offsets.nbytes
+
+    def year_rows(self, year_code):
+        return slice(self.offsets[year_code], self.offsets[year_code + 1])
+
+    def memoize(self, key, build):
+        # the arrays build() returns for a selection order, built once and counted in the size of the view
+        arrays = self.memo.get(key)
+        if arrays is None:
+            arrays = build()
+            # two threads may build the same key, only the stored arrays are counted
+            if self.memo.setdefault(key, arrays) is arrays:
+                size = sum(ArrayBytes(item) for item in arrays if isinstance(item, np.ndarray))
+                self.nbytes += size
+                if self.on_resize is not None:
+                    self.on_resize(size)
+            arrays = self.memo[key]
+        return arrays
+
+def ArrayBytes(array):
+    # an object array only holds pointers, the objects it points to are counted as well
+    if array.dtype == object:
+        return array.nbytes + sum(sys.getsizeof(item) for item in array)
+    return array.nbytes
+
+class MergedDataCache:
+    # LRU cache of merged views keyed by the sorted tuple of indexes, capped by memory usage
+    # pinned views (the precomputed selections) sit outside the LRU and are never evicted
+    def __init__(self, build, max_bytes=256 * 1024 * 1024):
+        self.build = build
+        self.max_bytes = max_bytes
+        self.entries = ByteLRU(max_bytes) # key -> view
+        self.pinned = {} # key -> view
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        key = MakeMergedKey(key)
+        # the pinned views are only ever added, a lookup needs no lock
+        view = self.pinned.get(key)
+        if view is not None:
+            return view
+        with self.lock:
+            view = self.entries.get(key)
+            if view is not None:
+                return view
+
+        # building outside the lock so a slow build does not block the cache hits
+        view = self.build(list(key))
+        with self.lock:
+            return self.track(key, view)
+
+    def track(self, key, view):
+        # the view stored under the key, the memo it grows by is added to its size (see MergedView.memoize)
+        stored = self.entries.put(key, view, view.nbytes)
+        if stored is view:
+            view.on_resize = partial(self.resize, key, view)
+        return stored
+
+    def resize(self, key, view, size):
+        # a view of the LRU grew by its memo, the pinned views are not capped
+        with self.lock:
+            self.entries.resize(key, view, size)
+
+    def pin(self, keys):
+        for key in map(MakeMergedKey, keys):
+            if key not in self.pinned:
+                self.pinned[key] = self.build(list(key))
+        # views of the LRU which are pinned now are not needed there anymore
+        with self.lock:
+            for key in [key for key in self.pinned if key in self.entries]:
+                self.entries.pop(key)
+
+    def adopt(self, other, keep):
+        # the views of another cache for which keep(key) holds, the pinned ones stay pinned
+        pinned = {key: view for key, view in list(other.pinned.items()) if keep(key)}
+        with other.lock:
+            entries = [(key, view) for key, (view, _) in other.entries.items() if keep(key)]
+        with self.lock:
+            self.pinned = {**pinned, **self.pinned}
+            for key, view in entries:
+                if key not in self.pinned and key not in self.entries:
+                    self.track(key, view)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.pinned = {}
+
+class QueryResult:
+    # the rows of DataHandler.query: country display names, years and one float32 value column per index
+    def __init__(self, indexes, countries, years, values):
+        self.indexes = indexes
+        self.countries = countries
+        self.years = years
+        self.values = values
+
+    def __len__(self):
+        return len(self.years)
+
+    def to_frame(self):
+        # the same rows in the long format of get_merged_df
+        df = pd.DataFrame({"country": self.countries, "year": self.years})
+        for i, name in enumerate(self.indexes):
+            df[name] = self.values[:, i]
+        return df
 
 def MergeDataFrames(dfs, how="inner"):
     if len(dfs) != 0:
@@ -173,26 +890,6 @@ def MergeDataFrames(dfs, how="inner"):
     else:
         return pd.DataFrame()
 
-def test():
-    DemocracyIndex = LoadDemocracyIndex()
-    print (F"DemocracyIndex.columns")
-    print (F"{DemocracyIndex.columns}")
-    BigmacIndex = LoadBigMacIndex()
-    print (F"BigmacIndex.columns")
-    print (F"{BigmacIndex.columns}")
-    GDPData = LoadGDPCountry()
-    print (F"GDPData.columns")
-    print (F"{GDPData.columns}")
-    GDPCapita = LoadGDPCapita()
-    print (F"GDPCapita.columns")
-    print (F"{GDPCapita.columns}")
-
-
-    dataframes = [DemocracyIndex, BigmacIndex, GDPData, GDPCapita]
-
-    MergedIndex = MergeDataFrames (dataframes)
-    print (F"MergedIndex.columns")
-    print (F"{MergedIndex.columns}")
-    print (F"{MergedIndex[['country', 'year',"GDPValue", "DIIndex", "BMI", "GDPCapitaValue"]].head(5)}")
-
-test()
\ No newline at end of file
+if __name__ == "__main__":
+    # ingest step: (re)builds the snapshot for every index whose source changed
+    LoadIndexes(list(INDEX_SOURCES))
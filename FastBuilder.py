@@ -0,0 +1,303 @@
+import base64
+import json
+from functools import lru_cache
+
+import numpy as np
+import plotly.colors as pc
+import plotly.io as pio
+
+import chart_config as cc
+from Builder import get_line_colors, pick_line_color, get_map_texts, get_legend_name, get_map_arrays
+
+try:
+    import orjson
+except ImportError: # optional, the standard json module is the fallback
+    orjson = None
+
+# the figures of Builder.py as plain dicts holding numpy arrays, with no graph_objects validation on the way
+# Builder.py stays the reference: the same arguments give the same figure json (checked by benchmark.py)
+# the dicts only hold what plotly's validation would have produced, e.g. title="x" is written as {"text": "x"}
+
+def EncodeDefault(obj):
+    # what orjson (or json) cannot serialize natively: object/non contiguous arrays and numpy scalars
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def to_json(fig):
+    # orjson writes NaN/inf as null like plotly does, the plain json fallback goes through plotly's encoder for that
+    if orjson is not None:
+        return orjson.dumps(fig, default=EncodeDefault, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return pio.json.to_json_plotly(fig, engine="json")
+
+def typed_array(array):
+    # numeric trace data as a plotly.js typed array: the raw little endian bytes in base64 instead of a number list
+    # strings have no binary form in plotly.js, they stay lists
+    array = np.ascontiguousarray(array)
+    if array.size == 0:
+        return array.tolist()
+    spec = {"dtype": array.dtype.newbyteorder("<").str[1:], "bdata": base64.b64encode(array.astype(array.dtype.newbyteorder("<"), copy=False).tobytes()).decode()}
+    if array.ndim > 1:
+        spec["shape"] = ", ".join(str(size) for size in array.shape)
+    return spec
+
+# the default template go.Figure writes into every figure's layout
+@lru_cache(maxsize=None)
+def get_template():
+    return json.loads(pio.json.to_json_plotly(pio.templates[pio.templates.default]))
+
+@lru_cache(maxsize=None)
+def get_colorscale(name):
+    return pc.get_colorscale(name)
+
+def make_figure(data, layout, frames=None):
+    fig = {"data": data, "layout": {**layout, "template": get_template()}}
+    if frames is not None:
+        fig["frames"] = frames
+    return fig
+
+def build_line_traces(country, color, selected_indexes, dh):
+    traces = []
+    result = dh.query(selected_indexes, countries=[country])
+    x = result.years.astype(np.int16)
+    values = result.values
+    for i, index in enumerate(selected_indexes[:2]):
+        line = {"color": color, "width": 2}
+        if i == 1:
+            line["dash"] = "dot"
+        traces.append({
+            "line": line,
+            "mode": "lines+markers",
+            "name": f"{country} - {cc.chart_config[index]["chart_name"]}",
+            "showlegend": True,
+            "x": typed_array(x),
+            "y": typed_array(values[:, i]),
+            "yaxis": "y" if i == 0 else "y2",
+            "type": "scatter",
+        })
+    return traces
+
+def build_line_chart(selected_countries, selected_indexes, dh, country_colors=None):
+    if len(selected_indexes) == 0:
+        return make_figure([], {
+            "title": {"text": ""},
+            "xaxis": {"title": {"text": "Year"}},
+            "margin": {"r": 150},
+            "plot_bgcolor": "rgba(0,0,0,0)",
+            "paper_bgcolor": "rgba(0,0,0,0)",
+        })
+
+    country_colors = country_colors or get_line_colors(selected_countries)
+    data = []
+    for country in selected_countries:
+        data.extend(build_line_traces(country, country_colors[country], selected_indexes, dh))
+
+    title_text = " & ".join(cc.chart_config[index]["chart_name"] for index in selected_indexes) + " Over Time"
+    layout = {
+        "title": {"text": title_text},
+        "xaxis": {"title": {"text": "Year"}},
+        "yaxis": {
+            "title": {"text": cc.chart_config[selected_indexes[0]]["chart_name"]},
+            "tickfont": {"color": "black"},
+            "range": [0, 11],
+        },
+        "legend": {
+            "x": 1.05,
+            "y": 1,
+            "xanchor": "left",
+            "yanchor": "top",
+            "bgcolor": "rgba(255,255,255,0.7)",
+            "bordercolor": "rgba(0,0,0,0.1)",
+            "borderwidth": 1,
+        },
+        "margin": {"r": 150},
+        "plot_bgcolor": "rgba(0,0,0,0)",
+        "paper_bgcolor": "rgba(0,0,0,0)",
+    }
+    for index in selected_indexes[1:]:
+        layout["yaxis2"] = {
+            "title": {"text": cc.chart_config[index]["chart_name"]},
+            "tickfont": {"color": "black"},
+            "overlaying": "y",
+            "side": "right",
+            "range": [0, 11],
+        }
+    return make_figure(data, layout)
+
+def build_map_frame(year, dh, selected_indexes, fixed_color_range=False):
+    view, locations, names, custom_data = get_map_arrays(dh, selected_indexes)
+    title_text, hover_info = get_map_texts(tuple(selected_indexes))
+    year_code = dh.year_codes[year]
+    rows = view.year_rows(year_code)
+    country_codes = view.country_codes[rows]
+    locations = locations[rows].tolist()
+    values = custom_data[rows]
+    data = []
+
+    if len(selected_indexes) > 0:
+        z = values[:, 0]
+        zmin, zmax = dh.get_color_range(selected_indexes[0], None if fixed_color_range else year)
+        data.append({
+            "colorscale": get_colorscale(cc.chart_config[selected_indexes[0]]["color"] + "s"),
+            "hoverinfo": "skip",
+            "locationmode": "ISO-3",
+            "locations": locations,
+            "marker": {"line": {"color": "white", "width": 0.5}},
+            "name": get_legend_name(dh, selected_indexes[0]),
+            "selected": {"marker": {"opacity": 1}},
+            "showlegend": True,
+            "showscale": False,
+            "unselected": {"marker": {"opacity": 1}},
+            "z": typed_array(z),
+            "zmax": float(zmax),
+            "zmin": float(zmin),
+            "type": "choropleth",
+        })
+
+    for i in range(1, len(selected_indexes)):
+        data.append({
+            "hoverinfo": "skip",
+            "locationmode": "ISO-3",
+            "locations": locations,
+            "marker": {
+                "color": cc.chart_config[selected_indexes[i]]["color"],
+                "line": {"color": "white", "width": 0.7},
+                "opacity": 0.5,
+                "size": typed_array(dh.get_bubble_sizes(selected_indexes[i])[year_code, country_codes]),
+            },
+            "mode": "markers",
+            "name": get_legend_name(dh, selected_indexes[i]),
+            "selected": {"marker": {"opacity": 0.5}},
+            "showlegend": True,
+            "unselected": {"marker": {"opacity": 0.5}},
+            "type": "scattergeo",
+        })
+
+    data.append({
+        "customdata": typed_array(values),
+        "hovertemplate": hover_info,
+        "hovertext": names[rows].tolist(),
+        "locationmode": "ISO-3",
+        "locations": locations,
+        "marker": {"opacity": 0, "size": 20},
+        "mode": "markers+text",
+        "selected": {"marker": {"opacity": 0}},
+        "showlegend": False,
+        "unselected": {"marker": {"opacity": 0}},
+        "type": "scattergeo",
+    })
+
+    return {
+        "data": data,
+        "layout": {"title": {"text": f"{title_text} in {year}" if selected_indexes else ""}},
+        "name": str(year),
+    }
+
+def build_map_info(years=[], dh=None, selected_indexes=[], fixed_color_range=False):
+    frames = []
+    if len(years) == 0:
+        frames.append({
+            "data": [{"hoverinfo": "skip", "locationmode": "ISO-3", "locations": [], "name": "", "showlegend": False, "type": "scattergeo"}],
+            "layout": {"title": {"text": ""}},
+        })
+    frames.extend(build_map_frame(year, dh, selected_indexes, fixed_color_range) for year in years)
+    return frames
+
+def build_map(frames, years=[], lazy=False):
+    layout = {
+        "clickmode": "event+select",
+        "geo": {
+            "bgcolor": "rgba(0,0,0,0)",
+            "projection": {"type": "natural earth"},
+            "showcoastlines": True,
+            "showframe": False,
+        },
+        "legend": {
+            "bgcolor": "rgba(255,255,255,0.7)",
+            "bordercolor": "black",
+            "borderwidth": 0.5,
+            "orientation": "v",
+            "title": {"text": "Legend"},
+            "x": 1.01,
+            "xanchor": "right",
+            "y": 0.92,
+            "yanchor": "middle",
+        },
+        "margin": {"b": 0, "l": 0, "r": 0, "t": 50},
+        "paper_bgcolor": "rgba(0,0,0,0)",
+        "plot_bgcolor": "rgba(0,0,0,0)",
+        "title": {"text": frames[0]["layout"]["title"]["text"] if frames else ""},
+    }
+    if years and not lazy:
+        layout["updatemenus"] = [{
+            "buttons": [
+                {
+                    "args": [None, {"frame": {"duration": 1000, "redraw": True},
+                                    "fromcurrent": True,
+                                    "transition": {"duration": 300, "easing": "linear"}}],
+                    "label": "Animation Play",
+                    "method": "animate",
+                },
+                {
+                    "args": [[None], {"frame": {"duration": 0, "redraw": False},
+                                      "mode": "immediate",
+                                      "transition": {"duration": 0}}],
+                    "label": "Animation Pause",
+                    "method": "animate",
+                },
+                {
+                    "args": [[str(years[0])], {"frame": {"duration": 500, "redraw": True},
+                                               "mode": "immediate",
+                                               "transition": {"duration": 300}}],
+                    "label": "Animation Reset",
+                    "method": "animate",
+                },
+            ],
+            "showactive": False,
+            "type": "buttons",
+            "x": 0.05,
+            "xanchor": "left",
+            "y": 0.95,
+            "yanchor": "top",
+        }]
+        layout["sliders"] = [{
+            "active": 0,
+            "len": 0.9,
+            "pad": {"b": 20, "t": 50},
+            "steps": [{
+                "args": [[str(year)], {"frame": {"duration": 300, "redraw": True},
+                                       "mode": "immediate",
+                                       "transition": {"duration": 200}}],
+                "label": str(year),
+                "method": "animate",
+            } for year in years],
+            "x": 0.5,
+            "xanchor": "center",
+        }]
+    return make_figure(frames[0]["data"], layout, frames=frames if not lazy else None)
+
+def build_bar_chart(selected_countries, year, all_indexes, dh):
+    result = dh.query(all_indexes, countries=selected_countries[:1], years=[year], how="outer")
+
+    if len(result) == 0:
+        return make_figure([], {"title": {"text": f"No data available for {selected_countries[0]} in {year}"}})
+
+    y_values = [None if np.isnan(value) else float(value) for value in result.values[0]]
+    return make_figure([{
+        "marker": {"color": "Darkorange"},
+        "text": [f"{y:.2f}" if y is not None else "" for y in y_values],
+        "textposition": "auto",
+        "x": [cc.chart_config[idx]["chart_name"] for idx in all_indexes],
+        "y": y_values,
+        "type": "bar",
+    }], {
+        "title": {"text": "Comparison for " + selected_countries[0] + " Across All Available Indexes"},
+        "xaxis": {"title": {"text": ""}},
+        "yaxis": {"title": {"text": "Value"}, "range": [0, 12]},
+        "barmode": "group",
+        "margin": {"r": 150, "t": 50, "b": 80},
+        "plot_bgcolor": "rgba(0,0,0,0)",
+        "paper_bgcolor": "rgba(0,0,0,0)",
+    })
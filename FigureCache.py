@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import threading
+
+import plotly.io as pio
+
+from Storage import AtomicFile, ByteLRU, ObjectBytes
+
+# content addressed cache of finished figures, shared by every session of the process
+# a figure is keyed by its builder, its normalized arguments and the version of the data it was built from,
+# so a repeated request skips the data preparation and the plotly object construction altogether
+# a figure is encoded to the json dash would send and parsed back once, when it is built or read from disk: every
+# session gets the same plain dict, read only; an optional directory keeps the json across worker restarts
+
+def MakeFigureKey(builder, data_version, args):
+    # the order of the selected indexes and countries matters for the figures (first index on the map, line colors)
+    # so lists are kept as they are, only the argument names are sorted
+    text = json.dumps([builder, data_version, args], sort_keys=True, default=str)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+class FigureCache:
+    # encode turns a built figure into its json, plotly's encoder by default
+    def __init__(self, max_bytes=64 * 1024 * 1024, directory=None, max_disk_bytes=512 * 1024 * 1024, encode=pio.json.to_json_plotly):
+        self.max_bytes = max_bytes
+        self.encode = encode
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = ByteLRU(max_bytes) # key -> figure dict
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, builder, data_version, build, **args):
+        # the figure as a plain dict, built by build() only when no session asked for it before
+        # a hit hands out the stored dict as it is, callers must not modify it
+        key = MakeFigureKey(builder, data_version, args)
+        figure = self.lookup(key)
+        if figure is None:
+            self.misses += 1
+            text = self.encode(build())
+            figure = self.store(key, json.loads(text))
+            self.write_disk(key, text)
+        else:
+            self.hits += 1
+        return figure
+
+    def lookup(self, key):
+        with self.lock:
+            figure = self.entries.get(key)
+        if figure is not None:
+            return figure
+        text = self.read_disk(key)
+        if text is not None:
+            return self.store(key, json.loads(text))
+        return None
+
+    def store(self, key, figure):
+        # the size is measured outside the lock, it walks the whole figure
+        size = ObjectBytes(figure)
+        with self.lock:
+            return self.entries.put(key, figure, size)
+
+    def disk_path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def read_disk(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self.disk_path(key), encoding="utf-8") as f:
+                text = f.read()
+            # touching the file so the disk tier is pruned least recently used first as well
+            os.utime(self.disk_path(key))
+            return text
+        except OSError:
+            return None
+
+    def write_disk(self, key, text):
+        if not self.directory:
+            return
+        try:
+            with AtomicFile(self.disk_path(key), "w", encoding="utf-8") as f:
+                f.write(text)
+            self.prune_disk()
+        except OSError:
+            # the disk tier is only an optimization, a failed write just means a rebuild after a restart
+            pass
+
+    def prune_disk(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
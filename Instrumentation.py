@@ -0,0 +1,133 @@
+import json
+import logging
+import threading
+import time
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+
+# opt-in latency and payload metrics of the dash callbacks, installed by main.py when DASH_METRICS is set
+# nothing is wrapped otherwise, so a disabled instrumentation costs nothing
+# every callback call is split into data preparation (DataHandler), figure building (Builder) and the rest
+# the metrics are per process, under gunicorn every worker serves its own /metrics
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# the methods/functions timed as the data preparation and the figure building phases
+DATA_METHODS = ["get_cube", "get_merged_view", "get_merged_df", "get_df_by_name", "query"]
+BUILDER_FUNCTIONS = ["build_line_chart", "build_line_traces", "build_map_info", "build_map_frame", "build_map", "build_bar_chart"]
+
+class Histogram:
+    # prometheus style cumulative histogram per label set
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {} # labels -> [count per bucket..., count of +Inf, sum]
+
+    def observe(self, labels, value):
+        series = self.series.setdefault(labels, [0] * (len(self.buckets) + 2))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in self.series.items():
+            label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {series[-2]}')
+            lines.append(f"{self.name}_count{{{label_text}}} {series[-2]}")
+            lines.append(f"{self.name}_sum{{{label_text}}} {series[-1]}")
+        return lines
+
+class CallbackMetrics:
+    def __init__(self, log_path=None):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.latency = Histogram("dash_callback_seconds", "Wall time of a dash callback", LATENCY_BUCKETS)
+        self.phase_latency = Histogram("dash_callback_phase_seconds", "Wall time of a dash callback per phase", LATENCY_BUCKETS)
+        self.response_size = Histogram("dash_callback_response_bytes", "Serialized size of a dash callback response", SIZE_BUCKETS)
+        self.logger = None
+        if log_path:
+            self.logger = logging.getLogger("dash_callback_metrics")
+            self.logger.propagate = False
+            self.logger.setLevel(logging.INFO)
+            self.logger.addHandler(RotatingFileHandler(log_path, maxBytes=10 * 1024 * 1024, backupCount=3))
+
+    def wrap_callback(self, name, func):
+        @wraps(func)
+        def measured(*args, **kwargs):
+            context = kwargs.get("callback_context")
+            triggered = context.triggered_inputs if context is not None else []
+            trigger = triggered[0]["prop_id"].rsplit(".", 1)[0] if triggered else ""
+            # the phases of this call, the stack holds the time spent in nested phases
+            record = self.local.record = {"data": 0.0, "figure": 0.0, "stack": [0.0]}
+            start = time.perf_counter()
+            try:
+                response = func(*args, **kwargs)
+            finally:
+                self.local.record = None
+            total = time.perf_counter() - start
+            size = len(response) if isinstance(response, (str, bytes)) else 0
+            self.observe(name, trigger, total, record["data"], record["figure"], size)
+            return response
+        return measured
+
+    def wrap_phase(self, phase, func):
+        @wraps(func)
+        def timed(*args, **kwargs):
+            record = getattr(self.local, "record", None)
+            if record is None:
+                return func(*args, **kwargs)
+            stack = record["stack"]
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                # only the time not spent in a nested phase counts for this one
+                record[phase] += elapsed - stack.pop()
+                stack[-1] += elapsed
+        return timed
+
+    def observe(self, name, trigger, total, data, figure, size):
+        labels = (("callback", name), ("trigger", trigger))
+        with self.lock:
+            self.latency.observe(labels, total)
+            self.phase_latency.observe(labels + (("phase", "data"),), data)
+            self.phase_latency.observe(labels + (("phase", "figure"),), figure)
+            self.phase_latency.observe(labels + (("phase", "other"),), max(total - data - figure, 0.0))
+            self.response_size.observe(labels, size)
+        if self.logger:
+            self.logger.info(json.dumps({
+                "time": time.time(), "callback": name, "trigger": trigger, "seconds": total,
+                "data_seconds": data, "figure_seconds": figure, "bytes": size,
+            }))
+
+    def render(self):
+        with self.lock:
+            lines = self.latency.render() + self.phase_latency.render() + self.response_size.render()
+        return "\n".join(lines) + "\n"
+
+def Instrument(app, dh, builder, log_path=None):
+    # wraps every server side callback registered so far, so call it after the last callback
+    metrics = CallbackMetrics(log_path)
+    # the methods are wrapped on the class, so the versions a hot reload publishes later are timed as well
+    for name in DATA_METHODS:
+        setattr(type(dh), name, metrics.wrap_phase("data", getattr(type(dh), name)))
+    for name in BUILDER_FUNCTIONS:
+        setattr(builder, name, metrics.wrap_phase("figure", getattr(builder, name)))
+    for callback in app.callback_map.values():
+        if "callback" in callback:
+            callback["callback"] = metrics.wrap_callback(callback["callback"].__name__, callback["callback"])
+
+    @app.server.route("/metrics")
+    def callback_metrics():
+        return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+    return metrics
@@ -0,0 +1,154 @@
+import argparse
+import gzip
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import plotly.io as pio
+
+from Storage import AtomicFile
+
+# static export of the dashboard for a read-only deployment: what the map callbacks return for every selection
+# the index dropdown allows and the bar chart of every country and year, written as gzip compressed json
+# main.py serves them from disk without loading any data when STATIC_EXPORT_DIR points at the export
+#   python StaticExport.py --out static_export --workers 8 --images png svg
+# the figures are built by main.py's own callbacks, in the data version, baseline year and normalization it starts with
+# images need a static renderer for plotly (the kaleido package)
+
+MANIFEST_NAME = "manifest.json"
+
+def SelectionName(selected_indexes):
+    return "+".join(selected_indexes) or "none"
+
+def ExportSelections(all_indexes, max_indexes):
+    # every selection the dropdown can send, in order: the first index is the choropleth, the others are bubbles
+    return [list(selection) for size in range(max_indexes + 1) for selection in itertools.permutations(all_indexes, size)]
+
+def FigurePath(directory, kind, *parts, extension=".json.gz"):
+    # <directory>/<kind>/<part>/.../<last part><extension>
+    return os.path.join(directory, kind, *map(str, parts[:-1]), str(parts[-1]) + extension)
+
+def WriteFile(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with AtomicFile(path) as f:
+        f.write(content)
+
+def WriteFigure(directory, kind, parts, figure, formats=(), image=None):
+    # the json next to its images, image is the figure to render when the json holds more (callback outputs)
+    WriteFile(FigurePath(directory, kind, *parts), gzip.compress(json.dumps(figure, separators=(",", ":")).encode(), compresslevel=9))
+    for image_format in formats:
+        WriteFile(FigurePath(directory, kind, *parts, extension="." + image_format), pio.to_image(figure if image is None else image, format=image_format))
+
+@lru_cache(maxsize=256)
+def ReadFigure(path):
+    with gzip.open(path, "rb") as f:
+        return json.load(f)
+
+class StaticFigures:
+    # the exported figures, read from disk in place of the data handler and the builders: no index is loaded
+    # the few data questions of the layout and the callbacks (years, country names) are answered by the manifest
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_NAME), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.baseline_year = self.manifest["baseline_year"]
+        self.normalization = self.manifest["normalization"]
+        self.country_iso3 = self.manifest["countries"] # display name -> ISO3 code
+        self.country_names = {code: name for name, code in self.country_iso3.items()}
+
+    def get_all_years(self):
+        return self.manifest["years"]
+
+    def get_baseline_years(self):
+        return [self.baseline_year]
+
+    def get_country_name(self, iso3_code):
+        return self.country_names.get(iso3_code)
+
+    def map(self, selected_indexes):
+        # the outputs of main.update_map for the selection
+        return ReadFigure(FigurePath(self.directory, "map", SelectionName(selected_indexes)))
+
+    def map_frame(self, selected_indexes, year):
+        return ReadFigure(FigurePath(self.directory, "map_frame", SelectionName(selected_indexes), year))
+
+    def bar_chart(self, country, year):
+        return ReadFigure(FigurePath(self.directory, "bar_chart", self.country_iso3[country], year))
+
+def InitWorker():
+    # every worker loads the data once, the tasks only build figures
+    import main
+    main.DataHandling.GetDataHandler().preload()
+
+def ExportSelection(directory, selected_indexes, formats=()):
+    # the map of a selection and, for the lazy map, its frame of every year; returns the number of figures
+    import main
+    dh = main.DataHandling.GetDataHandler()
+    merged_key = list(dh.get_merged_key(selected_indexes))
+    name = SelectionName(selected_indexes)
+    outputs = main.update_map(selected_indexes, merged_key, dh.baseline_year, dh.normalization)
+    WriteFigure(directory, "map", [name], outputs, formats, image=outputs[0] if main.lazy_map_frames else outputs)
+    if not main.lazy_map_frames:
+        return 1
+    years = dh.get_merged_view(merged_key).years
+    for year in years:
+        WriteFigure(directory, "map_frame", [name, year], main.MapFrame(dh, year, selected_indexes))
+    return 1 + len(years)
+
+def ExportCountry(directory, country, formats=()):
+    # the bar chart of a country in every year
+    import main
+    dh = main.DataHandling.GetDataHandler()
+    iso3_code = dh.all_country_iso3[dh.country_codes[country]]
+    years = dh.get_all_years()
+    for year in years:
+        WriteFigure(directory, "bar_chart", [iso3_code, year], main.BarChart(dh, [country], year), formats)
+    return len(years)
+
+def Export(directory, workers=None, formats=()):
+    # the selections and the countries are spread over a process pool, the manifest is written last so an
+    # unfinished export is never served; returns the number of figures written
+    # the figures are built from the data, never from a previous export (the workers inherit the environment)
+    os.environ.pop("STATIC_EXPORT_DIR", None)
+    import main
+    dh = main.DataHandling.GetDataHandler()
+    # brings the snapshot up to date once, before the workers read it
+    dh.preload()
+    selections = ExportSelections(dh.get_all_indexes(), main.max_displayed_indexes)
+    with ProcessPoolExecutor(max_workers=workers, initializer=InitWorker) as pool:
+        jobs = [pool.submit(ExportSelection, directory, selection, formats) for selection in selections]
+        jobs += [pool.submit(ExportCountry, directory, country, formats) for country in dh.all_countries]
+        count = sum(job.result() for job in jobs)
+    manifest = {
+        "data_version": dh.get_data_version(),
+        "baseline_year": dh.baseline_year,
+        "normalization": dh.normalization,
+        "lazy_map_frames": main.lazy_map_frames,
+        "fixed_color_range": main.fixed_color_range,
+        "max_displayed_indexes": main.max_displayed_indexes,
+        "selections": [SelectionName(selection) for selection in selections],
+        "years": dh.get_all_years(),
+        "countries": dict(zip(dh.all_countries, dh.all_country_iso3)),
+        "formats": list(formats),
+    }
+    WriteFile(os.path.join(directory, MANIFEST_NAME), json.dumps(manifest, indent=1).encode())
+    return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the dashboard's figures for the static serving mode")
+    parser.add_argument("--out", default=os.environ.get("STATIC_EXPORT_DIR", "static_export"))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--images", nargs="*", default=[], choices=["png", "svg"], help="also render the figures as images")
+    args = parser.parse_args()
+
+    if args.images:
+        try:
+            import kaleido # only checked here, so a missing renderer fails before the export starts
+        except ImportError:
+            parser.error("--images needs the kaleido package")
+    start = time.perf_counter()
+    count = Export(args.out, args.workers, args.images)
+    print(f"{count} figures written to {args.out} in {time.perf_counter() - start:.1f}s")
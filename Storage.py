@@ -0,0 +1,94 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# storage helpers shared by the caches of the data handler and the figures, the snapshot and the static export
+
+class ByteLRU:
+    # least recently used entries capped by their total size in bytes, the newest entry is always kept
+    # not thread safe on its own, the cache using it holds its own lock around every call
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict() # key -> (value, size in bytes)
+        self.total_bytes = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def items(self):
+        # (key, (value, size)) from the least to the most recently used
+        return self.entries.items()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value, size):
+        # the value stored under the key: an entry already there is kept and returned instead
+        if key in self.entries:
+            return self.get(key)
+        self.entries[key] = (value, size)
+        self.total_bytes += size
+        self.evict()
+        return value
+
+    def resize(self, key, value, size):
+        # an entry grew by size bytes, only while the key still holds this value
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] is value:
+            self.entries[key] = (value, entry[1] + size)
+            self.total_bytes += size
+            self.evict()
+
+    def pop(self, key):
+        value, size = self.entries.pop(key)
+        self.total_bytes -= size
+        return value
+
+    def evict(self):
+        # dropping the least recently used entries until the cap is met, the newest one is always kept
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, (_, size) = self.entries.popitem(last=False)
+            self.total_bytes -= size
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
+
+@contextmanager
+def AtomicFile(path, mode="wb", **kwargs):
+    # a file written next to the target and renamed over it once complete, so readers never see a partial file
+    # the temporary name is unique per process and thread, concurrent writers of one target never share it
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, mode, **kwargs) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def ObjectBytes(value):
+    # size of a json like value (dicts, lists, strings, numbers) with everything it holds
+    # walked with a stack instead of recursion: a figure with every frame holds some 100k objects
+    getsizeof = sys.getsizeof
+    total = 0
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        total += getsizeof(value)
+        if type(value) is dict:
+            total += sum(map(getsizeof, value))
+            stack.extend(value.values())
+        elif type(value) is list:
+            stack.extend(value)
+    return total
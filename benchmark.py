@@ -0,0 +1,211 @@
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+
+import Builder as b
+import DataHandling
+import FastBuilder
+import FigureCache
+
+# benchmark suite of the data loading, merging and figure building
+#   python benchmark.py                       real data plus the default synthetic scales
+#   python benchmark.py --scales 1x1 100x10   synthetic data with <countries>x<years> times the real size
+#   python benchmark.py --compare old.json    also prints the ratio to an earlier result file
+# results are written as json (see --output), one entry per benchmark in ms
+
+DEFAULT_SCALES = ["1x1", "10x1", "1x10", "10x10", "100x1"]
+# size of the real data the synthetic scales multiply
+BASE_COUNTRIES = 250
+BASE_YEARS = 25
+
+def bench(fn, repeat=20, setup=None):
+    # best wall time of a call in ms, the first call warms the caches
+    if setup:
+        setup()
+    fn()
+    best = float("inf")
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def SyntheticEntries(country_scale=1, year_scale=1, density=0.7, seed=0):
+    # snapshot entries shaped like the real indexes: every index covers a random part of the country x year grid
+    rng = np.random.default_rng(seed)
+    countries = np.array([f"Country {i:06d}" for i in range(BASE_COUNTRIES * country_scale)])
+    years = np.arange(2000, 2000 + BASE_YEARS * year_scale, dtype=np.int64)
+    grid_countries, grid_years = np.meshgrid(countries, years, indexing="ij")
+    entries = {}
+    for name in DataHandling.INDEX_SOURCES:
+        has_data = rng.random(grid_countries.shape) < density
+        entries[name] = ("synthetic", pd.DataFrame({
+            "country": grid_countries[has_data],
+            "year": grid_years[has_data],
+            # the deflated indexes are stored as nominal money, the others as scores
+            name: rng.uniform(1, 100_000, has_data.sum()) if name in DataHandling.DEFLATED_INDEXES else rng.uniform(0, 10, has_data.sum()),
+        }))
+    return entries
+
+def SyntheticDataHandler(country_scale=1, year_scale=1, directory=None):
+    path = os.path.join(directory or tempfile.gettempdir(), f"synthetic_{country_scale}x{year_scale}.npz")
+    DataHandling.WriteSnapshot(SyntheticEntries(country_scale, year_scale), path)
+    dh = DataHandling.DataHandler(snapshot_path=path, check_sources=False)
+    dh.preload()
+    return dh
+
+def bench_loaders(results):
+    for name, (loader, _) in DataHandling.INDEX_SOURCES.items():
+        results[f"load/{name}"] = bench(loader, repeat=3)
+    results["load/snapshot"] = bench(lambda: DataHandling.LoadIndexes(list(DataHandling.INDEX_SOURCES)), repeat=5)
+
+def bench_data_handler(dh, prefix, results):
+    indexes = dh.get_all_indexes()
+    for size in range(1, len(indexes) + 1):
+        dfs = [dh.get_df_by_name(name) for name in indexes[:size]]
+        for how in ("inner", "outer"):
+            results[f"{prefix}/merge/{how}/{size}"] = bench(lambda: DataHandling.MergeDataFrames(dfs, how=how), repeat=5)
+
+    # compact frames (shared categorical country, int16 year, float32 values) against the plain dtypes they replaced
+    plain_dfs = [
+        df.astype({"country": object, "year": np.int64, name: np.float64})
+        for name, df in ((name, dh.get_df_by_name(name)) for name in indexes)
+    ]
+    compact_dfs = [dh.get_df_by_name(name) for name in indexes]
+    for label, dfs in (("plain", plain_dfs), ("compact", compact_dfs)):
+        results[f"{prefix}/dtypes/{label}/merge_outer_ms"] = bench(lambda: DataHandling.MergeDataFrames(dfs, how="outer"), repeat=5)
+        results[f"{prefix}/dtypes/{label}/merge_inner_ms"] = bench(lambda: DataHandling.MergeDataFrames(dfs[:2]), repeat=5)
+        results[f"{prefix}/dtypes/{label}/outer_bytes"] = int(DataHandling.MergeDataFrames(dfs, how="outer").memory_usage(deep=True).sum())
+
+    # pushed down queries: the cells of the request are gathered, the cost follows the result instead of the data
+    results[f"{prefix}/query/country"] = bench(lambda: dh.query(indexes[:2], countries=dh.all_countries[:1]), repeat=100)
+    results[f"{prefix}/query/country_year"] = bench(lambda: dh.query(indexes, countries=dh.all_countries[:1], years=dh.get_all_years()[:1], how="outer"), repeat=100)
+    results[f"{prefix}/query/all"] = bench(lambda: dh.query(indexes[:2]), repeat=5)
+
+    # precomputing every selection of up to 2 indexes, and a selection lookup once they are pinned
+    results[f"{prefix}/precompute_merged_views"] = bench(lambda: dh.precompute_merged_views(2), repeat=5, setup=dh.merged_cache.clear)
+    dh.precompute_merged_views(2)
+    results[f"{prefix}/merged_view_lookup"] = bench(lambda: dh.get_merged_view(indexes[:2]), repeat=1000)
+    dh.merged_cache.clear()
+
+    # switching the baseline year (the deflated indexes adjusted for a new baseline) or the normalization
+    # (every index scored again from its raw values), then the cached handler
+    def reset_variants():
+        for key in [key for key in dh.variants if dh.variants[key] is not dh]:
+            del dh.variants[key]
+    other_year = dh.get_baseline_years()[0]
+    results[f"{prefix}/baseline/first"] = bench(lambda: dh.variant(baseline_year=other_year).preload(), repeat=5, setup=reset_variants)
+    results[f"{prefix}/baseline/cached"] = bench(lambda: dh.variant(baseline_year=other_year), repeat=1000)
+    for scheme in ("z-score", "percentile"):
+        results[f"{prefix}/normalization/{scheme}"] = bench(lambda: dh.variant(normalization=scheme).preload(), repeat=5, setup=reset_variants)
+    reset_variants()
+
+    # the json round trip the merged_df store used to do, kept as a reference for the server side cache
+    merged_df = dh.get_merged_df(indexes[:2])
+    results[f"{prefix}/store_json/serialize"] = bench(lambda: merged_df.to_json(date_format="iso", orient="split"), repeat=5)
+    merged_json = merged_df.to_json(date_format="iso", orient="split")
+    results[f"{prefix}/store_json/deserialize"] = bench(lambda: pd.read_json(io.StringIO(merged_json), orient="split"), repeat=5)
+    results[f"{prefix}/store_json/bytes"] = len(merged_json)
+
+def bench_builders(dh, prefix, results):
+    indexes = dh.get_all_indexes()
+    for size in range(1, len(indexes) + 1):
+        selected_indexes = indexes[:size]
+        years = dh.get_merged_view(selected_indexes).years
+        results[f"{prefix}/build_map_info/{size}"] = bench(lambda: b.build_map_info(years, dh, selected_indexes), repeat=5)
+        # cold: the merged view and everything memoized on it is rebuilt
+        results[f"{prefix}/build_map_info_cold/{size}"] = bench(lambda: b.build_map_info(years, dh, selected_indexes), repeat=5, setup=dh.merged_cache.clear)
+        frames = b.build_map_info(years, dh, selected_indexes)
+        results[f"{prefix}/build_map/{size}"] = bench(lambda: b.build_map(frames, years), repeat=5)
+
+    for country_count in (1, 10, 50):
+        countries = dh.all_countries[:country_count]
+        results[f"{prefix}/build_line_chart/{country_count}"] = bench(lambda: b.build_line_chart(countries, indexes[:2], dh), repeat=5)
+
+    results[f"{prefix}/build_bar_chart"] = bench(lambda: b.build_bar_chart(dh.all_countries[:1], dh.get_all_years()[0], indexes, dh))
+
+    # the full map through the figure cache: a miss builds and serializes it, a hit only parses the stored json
+    figure_cache = FigureCache.FigureCache()
+    years = dh.get_merged_view(indexes[:2]).years
+    build_map = lambda: figure_cache.get("map", dh.get_data_version(indexes[:2]), lambda: b.build_map(b.build_map_info(years, dh, indexes[:2]), years), selected_indexes=indexes[:2])
+    results[f"{prefix}/figure_cache/miss"] = bench(build_map, repeat=5, setup=figure_cache.clear)
+    results[f"{prefix}/figure_cache/hit"] = bench(build_map, repeat=5)
+
+def bench_backends(dh, prefix, results):
+    # the graph_objects builders (Builder.py, the reference) against the dict builders (FastBuilder.py)
+    # both including the serialization dash does; that both give the same figure json is tests/test_backends.py
+    indexes = dh.get_all_indexes()
+    years = dh.get_merged_view(indexes[:2]).years
+    countries = dh.all_countries[:10]
+    cases = {
+        "build_map": lambda builder: builder.build_map(builder.build_map_info(years, dh, indexes[:2]), years),
+        "build_map_lazy": lambda builder: builder.build_map(builder.build_map_info(years[:1], dh, indexes[:2]), years, lazy=True),
+        "build_map_empty": lambda builder: builder.build_map(builder.build_map_info(), lazy=True),
+        "build_map_frame": lambda builder: builder.build_map_frame(years[0], dh, indexes[:2]),
+        "build_map_frame_fixed_range": lambda builder: builder.build_map_frame(years[0], dh, indexes[:2], fixed_color_range=True),
+        "build_line_chart": lambda builder: builder.build_line_chart(countries, indexes[:2], dh),
+        "build_bar_chart": lambda builder: builder.build_bar_chart(countries[:1], years[0], indexes, dh),
+    }
+    for name, build in cases.items():
+        go_json = lambda: pio.json.to_json_plotly(build(b))
+        fast_json = lambda: FastBuilder.to_json(build(FastBuilder))
+        go_ms = results[f"{prefix}/backend/{name}/go"] = bench(go_json, repeat=5)
+        fast_ms = results[f"{prefix}/backend/{name}/fast"] = bench(fast_json, repeat=5)
+        results[f"{prefix}/backend/{name}/speedup"] = go_ms / fast_ms
+        results[f"{prefix}/backend/{name}/bytes"] = len(fast_json())
+
+def CurrentCommit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the data loading, merging and figure building")
+    parser.add_argument("--scales", nargs="*", default=DEFAULT_SCALES, help="synthetic <countries>x<years> scales")
+    parser.add_argument("--no-real", action="store_true", help="skip the benchmarks on the real data")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="earlier result file to compare with")
+    args = parser.parse_args()
+
+    results = {}
+    if not args.no_real:
+        bench_loaders(results)
+        dh = DataHandling.GetDataHandler()
+        dh.preload()
+        bench_data_handler(dh, "real", results)
+        bench_builders(dh, "real", results)
+        bench_backends(dh, "real", results)
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in args.scales:
+            country_scale, year_scale = (int(value) for value in scale.split("x"))
+            dh = SyntheticDataHandler(country_scale, year_scale, directory)
+            bench_data_handler(dh, f"synthetic_{scale}", results)
+            bench_builders(dh, f"synthetic_{scale}", results)
+            bench_backends(dh, f"synthetic_{scale}", results)
+
+    previous = json.load(open(args.compare))["results"] if args.compare else {}
+    for name, value in results.items():
+        line = f"{name:<48} {value:>12.2f}"
+        if name in previous and previous[name]:
+            line += f"   x{value / previous[name]:.2f}"
+        print(line)
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "commit": CurrentCommit(),
+            "python": platform.python_version(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }, f, indent=2)
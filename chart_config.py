@@ -1,4 +1,6 @@
 # metadata for displaying the correct text everywhere
+# the hover shows the raw value of an index (in the prices of the baseline year for money) through its
+# prefix and suffix, followed by the score the charts show
 
 chart_config = {
     "BMI": {
@@ -20,27 +22,27 @@ chart_config = {
         "legend_name": "GDP [0 - 10] Log Scaled",
         "chart_name": "GDP",
         "hover_prefix": "%{customdata[",
-        "hover_suffix": "]} US$B"
+        "hover_suffix": "]:,.0f} million US$"
     },
     "GDPCapitaValue": {
         "color": "Orange",
         "legend_name": "GDP Per Capita [0 - 10] Log Scaled",
         "chart_name": "GDP Per Capita",
         "hover_prefix": "%{customdata[",
-        "hover_suffix": "]:.2f} US$"
+        "hover_suffix": "]:,.0f} US$"
     },
         "HDIValue": {
         "color": "Purple",
         "legend_name": "Human Development Index [0 - 10] Scaled",
         "chart_name": "Human Development Index",
         "hover_prefix": "%{customdata[",
-        "hover_suffix": "]:.2f}"
+        "hover_suffix": "]:.3f}"
     },
         "LifeExpectancy": {
         "color": "grey",
         "legend_name": "Life Expectancy [0 - 10] min-max normalized",
         "chart_name": "Life Expectancy Index",
         "hover_prefix": "%{customdata[",
-        "hover_suffix": "]:.2f}"
+        "hover_suffix": "]:.1f} years"
     }
 }
\ No newline at end of file
@@ -1,93 +1,190 @@
-import pandas as pd
-from pandas.core.indexes.api import all_indexes_same
+import os
 
-import DataHandling as dh
-import Builder as b
-from dash import Dash, dcc, html, Output, Input, State, ctx
+import flask
+
+import DataHandling
+import Builder
+import FastBuilder
+import FigureCache
+import Instrumentation
+import StaticExport
+from dash import Dash, dcc, html, Output, Input, State, ctx, Patch, no_update
 
 # the amount of indexes allowed through the app:
 max_displayed_indexes = 2
-# the data handler
-dh = dh.DataHandler()
+# the index dropdown only reaches the server once it kept its value this long, rapid edits are coalesced
+index_debounce_ms = 400
+# lazy map: only the active year is shipped, the other years are fetched when the slider/play reaches them
+# eager map: every year is a frame of the figure and animated by plotly itself
+lazy_map_frames = True
+# map colors: one color range per index over every year (frames stay comparable) instead of one per year
+fixed_color_range = False
+# figure backend: plain dicts of numpy arrays serialized by orjson (FastBuilder), or plotly graph objects (Builder, the reference)
+fast_figures = True
+b = FastBuilder if fast_figures else Builder
+# the data handler is shared by the whole process and loads the indexes on first use
+# every callback takes the current version once and uses it throughout, so a hot reload publishing a new
+# version (see watch_sources) never mixes two versions in one response
+# watch_sources: the source csvs are polled every source_watch_interval seconds and a changed index is re-ingested
+watch_sources = True
+source_watch_interval = 5.0
+# static mode: the figures StaticExport.py wrote to STATIC_EXPORT_DIR are served from disk and no data is loaded
+# the line chart (any set of countries) and other baselines or normalizations than the exported one are not offered
+static_export_dir = os.environ.get("STATIC_EXPORT_DIR")
+static_figures = StaticExport.StaticFigures(static_export_dir) if static_export_dir else None
+if static_figures and static_figures.manifest["lazy_map_frames"] != lazy_map_frames:
+    raise ValueError(f"the export in {static_export_dir} was written with lazy_map_frames={static_figures.manifest['lazy_map_frames']}")
+# finished figures shared by every session, FIGURE_CACHE_DIR keeps them across restarts
+figure_cache = FigureCache.FigureCache(directory=os.environ.get("FIGURE_CACHE_DIR"), **({"encode": FastBuilder.to_json} if fast_figures else {}))
+# heavy map rebuilds (the eager map, every year at once) run as background callbacks in a local process pool
+# the jobs and their results live in a diskcache directory (DASH_JOB_CACHE), no broker is needed
+# needs the dash[diskcache] extra, without it the rebuilds stay in the request thread
+background_builds = True
+background_manager = None
+if background_builds and not lazy_map_frames:
+    try:
+        import diskcache
+        from dash import DiskcacheManager
+        background_manager = DiskcacheManager(diskcache.Cache(os.environ.get("DASH_JOB_CACHE", ".dash_jobs")))
+    except ImportError:
+        background_manager = None
 # dash app
-app = Dash(__name__)
-
-app.layout = html.Div([
-    html.H1("Well-being Index comparison World Wide", style={"textAlign": "center"}),
+app = Dash(__name__, background_callback_manager=background_manager)
 
+# year controls of the lazy map, the eager map has them inside the figure
+map_controls = [
     html.Div([
-        html.Label("Select up to 2 Indexes:", style={"fontWeight": "bold"}),
-        dcc.Dropdown(
-            id="index-dropdown",
-            options=[
-                {"label": "Big Mac Index", "value": "BMI"},
-                {"label": "Democracy Index", "value": "DIIndex"},
-                {"label": "GDP", "value": "GDPValue"},
-                {"label": "GDP Per Capita", "value": "GDPCapitaValue"},
-                {"label": "Human Development Index", "value": "HDIValue"},
-                {"label": "Life Expectancy Index", "value": "LifeExpectancy"},
-            ],
-            value=[],  # default empty selection
-            multi=True,
-            maxHeight=300,
-            style={"width": "100%"}
-        )
-    ], style={
-        "display": "flex",
-        "flexDirection": "column",
-        "alignItems": "stretch",
-        "padding": "10px",
-        "width": "30% ",
-        "margin": "0 auto"
-    }),
-
-    html.Div(
-        dcc.Graph(id="world-map", figure=b.build_map(frames=b.build_map_info()), style={"width": "100%", "height": "100%"}),
-        style={
-            "display": "flex",
-            "justifyContent": "center",
-            "alignItems": "center",
-            "flexDirection": "column",
-            "width": "98%",
-            "height": "80vh"
-        }
-    ),
-    dcc.Dropdown(
-        id="chart-selector",
-        options=[
-            {"label": "Line Chart", "value": "line"},
-            {"label": "Bar Chart", "value": "bar"},
-        ],
-        value=None,
-        placeholder="Select a chart to display"
-    ),
-    html.Div([
-        dcc.Graph(id="line-chart"),
-        html.Button("Reset Line Chart", id="reset-btn-line", n_clicks=0, className="plotly-btn")
-    ],
-    id="line-container",
-    style={"display": "none"}
-    ),
-    html.Div(
-        [
+        html.Button("Animation Play", id="map-play-btn", n_clicks=0, className="plotly-btn"),
+        html.Button("Animation Pause", id="map-pause-btn", n_clicks=0, className="plotly-btn"),
+        html.Button("Animation Reset", id="map-reset-btn", n_clicks=0, className="plotly-btn"),
+        html.Div(dcc.Slider(id="map-year-slider", min=0, max=0, step=None, marks={}, value=None), style={"flex": "1"}),
+        dcc.Interval(id="map-play-interval", interval=1000, disabled=True),
+        dcc.Store(id="map-frames", data={}), # client side cache of the frames already sent, keyed by "<merged key>/<year>"
+    ], style={"display": "flex", "alignItems": "center", "width": "90%", "margin": "0 auto"})
+] if lazy_map_frames else []
+
+# the normalizations offered on the dashboard, "default" is each index's own scheme
+NORMALIZATION_LABELS = {
+    "default": "Default per index",
+    "log-max": "Log scaled to the maximum",
+    "min-max": "Min-max",
+    "z-score": "Z-score",
+    "percentile": "Percentile rank",
+}
+
+def EmptyMap(dh):
+    # the map of the empty selection, what update_map returns for it
+    if static_figures:
+        outputs = static_figures.map([])
+        return outputs[0] if lazy_map_frames else outputs
+    return figure_cache.get("map", dh.get_data_version([]), lambda: b.build_map(frames=b.build_map_info(), lazy=lazy_map_frames), lazy=lazy_map_frames)
+
+# a function, so every page load gets the years of the current data version
+def serve_layout():
+    dh = static_figures or DataHandling.GetDataHandler()
+    return html.Div([
+        html.H1("Well-being Index comparison World Wide", style={"textAlign": "center"}),
+
+        html.Div([
+            html.Label("Select up to 2 Indexes:", style={"fontWeight": "bold"}),
+            dcc.Dropdown(
+                id="index-dropdown",
+                options=[
+                    {"label": "Big Mac Index", "value": "BMI"},
+                    {"label": "Democracy Index", "value": "DIIndex"},
+                    {"label": "GDP", "value": "GDPValue"},
+                    {"label": "GDP Per Capita", "value": "GDPCapitaValue"},
+                    {"label": "Human Development Index", "value": "HDIValue"},
+                    {"label": "Life Expectancy Index", "value": "LifeExpectancy"},
+                ],
+                value=[],  # default empty selection
+                multi=True,
+                maxHeight=300,
+                style={"width": "100%"}
+            ),
+            # the nominal indexes (Big Mac Index, GDP, GDP per capita) are adjusted for inflation to this year's prices
+            html.Label("Prices of the year:", style={"fontWeight": "bold"}),
             dcc.Dropdown(
-                id='year-selector-bar',
-                options=[{'label': str(year), 'value': year} for year in dh.get_all_years()], #empty as well by default
-                value=dh.get_all_years()[0],  # default no year values
+                id="baseline-year",
+                options=[{"label": str(year), "value": year} for year in dh.get_baseline_years()],
+                value=dh.baseline_year,
                 clearable=False,
-                style={'width': '150px'}
+                style={"width": "150px"}
             ),
-            dcc.Graph(id="bar-chart"),
-            html.Button("Reset Bar Chart", id="reset-btn-bar", n_clicks=0, className="plotly-btn")
+            # how the raw values become the 0 - 10 scores on the charts, the hovers show the raw values as well
+            html.Label("Scale:", style={"fontWeight": "bold"}),
+            dcc.Dropdown(
+                id="normalization",
+                options=[{"label": label, "value": value} for value, label in NORMALIZATION_LABELS.items() if not static_figures or value == dh.normalization],
+                value=dh.normalization,
+                clearable=False,
+                style={"width": "100%"}
+            )
+        ], style={
+            "display": "flex",
+            "flexDirection": "column",
+            "alignItems": "stretch",
+            "padding": "10px",
+            "width": "30% ",
+            "margin": "0 auto"
+        }),
+
+        html.Div(
+            dcc.Graph(id="world-map", figure=EmptyMap(dh), style={"width": "100%", "height": "100%"}),
+            style={
+                "display": "flex",
+                "justifyContent": "center",
+                "alignItems": "center",
+                "flexDirection": "column",
+                "width": "98%",
+                "height": "80vh"
+            }
+        ),
+        html.Div("Building the map...", id="map-progress", style={"display": "none", "textAlign": "center"}),
+        *map_controls,
+        dcc.Dropdown(
+            id="chart-selector",
+            options=[
+                *([] if static_figures else [{"label": "Line Chart", "value": "line"}]),
+                {"label": "Bar Chart", "value": "bar"},
+            ],
+            value=None,
+            placeholder="Select a chart to display"
+        ),
+        html.Div([
+            dcc.Graph(id="line-chart"),
+            html.Button("Reset Line Chart", id="reset-btn-line", n_clicks=0, className="plotly-btn")
         ],
-        id="bar-container",
+        id="line-container",
         style={"display": "none"}
-    ),
-    dcc.Store(id="selected_countries_line", data=["Denmark"]),
-    dcc.Store(id="selected_countries_bar", data=["Denmark"]),
-    dcc.Store(id="selected_indexes"),
-    dcc.Store(id="merged_df")
-])
+        ),
+        html.Div(
+            [
+                dcc.Dropdown(
+                    id='year-selector-bar',
+                    options=[{'label': str(year), 'value': year} for year in dh.get_all_years()], #empty as well by default
+                    value=dh.get_all_years()[0],  # default no year values
+                    clearable=False,
+                    style={'width': '150px'}
+                ),
+                dcc.Graph(id="bar-chart"),
+                html.Button("Reset Bar Chart", id="reset-btn-bar", n_clicks=0, className="plotly-btn")
+            ],
+            id="bar-container",
+            style={"display": "none"}
+        ),
+        dcc.Store(id="selected_countries_line", data=["Denmark"]),
+        dcc.Store(id="line_colors", data={}), # color of every country in the line chart, kept stable across partial updates
+        dcc.Store(id="selected_countries_bar", data=["Denmark"]),
+        dcc.Store(id="index_selection", data=[]), # the debounced dropdown value
+        dcc.Store(id="index_limit", data=max_displayed_indexes),
+        dcc.Store(id="index_debounce_ms", data=index_debounce_ms),
+        dcc.Store(id="selected_indexes"),
+        dcc.Store(id="merged_key") # key of the merged view in the data handler's cache
+    ])
+
+
+app.layout = serve_layout
 
 @app.callback(
     Output("line-container", "style"),
@@ -107,24 +204,165 @@ def update_selected_charts(selected_chart):
 
 @app.callback(
     Output("world-map", "figure"),
+    *([
+        Output("map-year-slider", "min"),
+        Output("map-year-slider", "max"),
+        Output("map-year-slider", "marks"),
+        Output("map-year-slider", "value"),
+        Output("map-frames", "data"),
+    ] if lazy_map_frames else []),
     Input("selected_indexes", "data"),
-    Input("merged_df", "data"),
+    Input("merged_key", "data"),
+    Input("baseline-year", "value"),
+    Input("normalization", "value"),
+    running=[(Output("map-progress", "style"), {"display": "block", "textAlign": "center"}, {"display": "none"})],
+    # a new selection cancels the build still running for the previous one
+    **({"background": True, "cancel": [Input("index-dropdown", "value")]} if background_manager else {}),
+)
+def update_map(selected_indexes, merged_key, baseline_year, normalization):
+    if static_figures:
+        return static_figures.map(selected_indexes)
+    dh = DataHandling.GetDataHandler().variant(baseline_year, normalization)
+    years = dh.get_merged_view(merged_key).years
+    version = dh.get_data_version(selected_indexes)
+    if not lazy_map_frames:
+        return figure_cache.get("map", version, lambda: b.build_map(frames=b.build_map_info(years, dh, selected_indexes, fixed_color_range), years=years), selected_indexes=selected_indexes, lazy=False, fixed_color_range=fixed_color_range)
+
+    # only the first year is built, it also starts the new frame cache of this selection
+    if not years:
+        return figure_cache.get("map", version, lambda: b.build_map(frames=b.build_map_info(), lazy=True), lazy=True), 0, 0, {}, None, {}
+    # the first frame is built at most once, for both the figure and the frame cache
+    first_frame = []
+    def build_first_frame():
+        if not first_frame:
+            first_frame.append(b.build_map_frame(years[0], dh, selected_indexes, fixed_color_range))
+        return first_frame[0]
+    figure = figure_cache.get("map", version, lambda: b.build_map(frames=[build_first_frame()], years=years, lazy=True), selected_indexes=selected_indexes, year=years[0], lazy=True, fixed_color_range=fixed_color_range)
+    frame_cache = {MapFrameKey(selected_indexes, years[0], baseline_year, normalization): MapFrame(dh, years[0], selected_indexes, build_first_frame)}
+    marks = {year: str(year) for year in years}
+    return figure, years[0], years[-1], marks, years[0], frame_cache
+
+def MapFrameKey(selected_indexes, year, baseline_year, normalization):
+    # the selection in order, not the sorted merged key: the first index is the choropleth, so [A, B] and [B, A] differ
+    return "|".join(selected_indexes or []) + "/" + str(year) + "/" + str(baseline_year) + "/" + str(normalization)
+
+def MapFrame(dh, year, selected_indexes, build=None):
+    build = build or (lambda: b.build_map_frame(year, dh, selected_indexes, fixed_color_range))
+    return figure_cache.get("map_frame", dh.get_data_version(selected_indexes), build, selected_indexes=selected_indexes, year=year, fixed_color_range=fixed_color_range)
+
+if lazy_map_frames:
+    @app.callback(
+        Output("map-frames", "data", allow_duplicate=True),
+        Input("map-year-slider", "value"),
+        State("map-frames", "data"),
+        State("selected_indexes", "data"),
+        State("baseline-year", "value"),
+        State("normalization", "value"),
+        prevent_initial_call=True
+    )
+    def fetch_map_frame(year, frame_cache, selected_indexes, baseline_year, normalization):
+        # frames already on the client are not sent again, a new one is added with a partial update
+        key = MapFrameKey(selected_indexes, year, baseline_year, normalization)
+        if year is None or key in (frame_cache or {}):
+            return no_update
+        frame_cache = Patch()
+        if static_figures:
+            frame_cache[key] = static_figures.map_frame(selected_indexes, year)
+        else:
+            frame_cache[key] = MapFrame(DataHandling.GetDataHandler().variant(baseline_year, normalization), year, selected_indexes)
+        return frame_cache
+
+    # swapping the cached frame of the selected year into the map without a server round trip
+    app.clientside_callback(
+        """
+        function(year, frames, selected_indexes, baseline_year, normalization, figure) {
+            const frame = frames && frames[[(selected_indexes || []).join("|"), year, baseline_year, normalization].join("/")];
+            if (!frame || !figure) {
+                return window.dash_clientside.no_update;
+            }
+            const title = Object.assign({}, figure.layout.title, {text: frame.layout.title.text});
+            return Object.assign({}, figure, {data: frame.data, layout: Object.assign({}, figure.layout, {title: title})});
+        }
+        """,
+        Output("world-map", "figure", allow_duplicate=True),
+        Input("map-year-slider", "value"),
+        Input("map-frames", "data"),
+        State("selected_indexes", "data"),
+        State("baseline-year", "value"),
+        State("normalization", "value"),
+        State("world-map", "figure"),
+        prevent_initial_call=True
+    )
+
+    @app.callback(
+        Output("map-play-interval", "disabled"),
+        Input("map-play-btn", "n_clicks"),
+        Input("map-pause-btn", "n_clicks"),
+        prevent_initial_call=True
+    )
+    def toggle_map_play(_, __):
+        return ctx.triggered_id != "map-play-btn"
+
+    @app.callback(
+        Output("map-year-slider", "value", allow_duplicate=True),
+        Output("map-play-interval", "disabled", allow_duplicate=True),
+        Input("map-play-interval", "n_intervals"),
+        Input("map-reset-btn", "n_clicks"),
+        State("map-year-slider", "value"),
+        State("map-year-slider", "marks"),
+        prevent_initial_call=True
+    )
+    def step_map_year(_, __, year, marks):
+        # the interval is disabled again on reset and once the last year is reached, so a finished
+        # or reset animation stops polling the server like the eager one stops animating
+        years = sorted(int(year) for year in marks or {})
+        if not years:
+            return no_update, True
+        if ctx.triggered_id == "map-reset-btn":
+            return years[0], True
+        if year not in years:
+            return years[0], no_update
+        position = years.index(year)
+        if position + 1 >= len(years):
+            return no_update, True
+        return years[position + 1], position + 2 >= len(years)
+
+# the dropdown is limited and debounced on the client: every edit restarts the timer and only the value
+# it settles on is written to index_selection, so a burst of edits costs a single server round trip
+app.clientside_callback(
+    """
+    function(value, limit, delay) {
+        const no_update = window.dash_clientside.no_update;
+        const selected = (value || []).slice(0, limit);
+        const token = window.indexDebounceToken = (window.indexDebounceToken || 0) + 1;
+        return new Promise(resolve => setTimeout(() => {
+            if (token !== window.indexDebounceToken) {
+                resolve([no_update, no_update]);
+            } else {
+                resolve([selected.length < (value || []).length ? selected : no_update, selected]);
+            }
+        }, delay));
+    }
+    """,
+    Output("index-dropdown", "value"),                  # updates UI display, returns as much selected as much is allowed
+    Output("index_selection", "data"),
+    Input("index-dropdown", "value"),
+    State("index_limit", "data"),
+    State("index_debounce_ms", "data"),
+    prevent_initial_call=True
 )
-def update_map(selected_indexes, merged_df):
-    merged_df = pd.read_json(merged_df, orient="split") if merged_df else pd.DataFrame()
-    years = sorted(merged_df["year"].astype(int).unique()) if not merged_df.empty else []
-    return b.build_map(frames=b.build_map_info(years, merged_df, selected_indexes), years=years)
 
 @app.callback(
-    Output("index-dropdown", "value"),              # updates UI display
     Output("selected_indexes", "data"),                 # updates internal selection store
-    Output("merged_df", "data"),
-    Input("index-dropdown", "value"),
+    Output("merged_key", "data"),
+    Input("index_selection", "data"),
 )
-def update_selected_indexes(index_dropdown):
-    selected_indexes = index_dropdown[:max_displayed_indexes]
-    merged_df = dh.get_merged_df(selected_indexes)
-    return selected_indexes, selected_indexes, merged_df.to_json(date_format="iso", orient="split") #returns as much selected as much is allowed
+def update_selected_indexes(index_selection):
+    selected_indexes = (index_selection or [])[:max_displayed_indexes]
+    merged_key = DataHandling.MakeMergedKey(selected_indexes)
+    if not static_figures:
+        DataHandling.GetDataHandler().get_merged_view(merged_key) # warming the cache so the dependent callbacks only do a lookup
+    return selected_indexes, list(merged_key)
 
 
 # charts control callback
@@ -135,20 +373,23 @@ def update_selected_indexes(index_dropdown):
     Output("selected_countries_bar", "data"),
     Output("world-map", "clickData"),
     Output("year-selector-bar", "value"),
+    Output("line_colors", "data"),
     Input("world-map", "clickData"),
     Input("reset-btn-line", "n_clicks"),
     Input("reset-btn-bar", "n_clicks"),
     Input("selected_indexes", "data"),
     Input("chart-selector", "value"),
     Input("year-selector-bar", "value"),
-    State("merged_df", "data"),
+    Input("baseline-year", "value"),
+    Input("normalization", "value"),
     State("selected_countries_line", "data"),
     State("selected_countries_bar", "data"),
+    State("line_colors", "data"),
 )
-def update_charts(clickData, _, __, selected_indexes, selected_chart, selected_year_bar, merged_df, selected_countries_line, selected_countries_bar):
-    # reverting JSON
-    merged_df = pd.read_json(merged_df, orient="split") if merged_df else pd.DataFrame()
-
+def update_charts(clickData, _, __, selected_indexes, selected_chart, selected_year_bar, baseline_year, normalization, selected_countries_line, selected_countries_bar, line_colors):
+    dh = static_figures or DataHandling.GetDataHandler().variant(baseline_year, normalization)
+    toggled_position = None # position of the country removed from the line chart, or -1 if one was added
+    bar_clicked = False
     # reset buttons
     if ctx.triggered_id == "reset-btn-line":
         selected_countries_line = ["Denmark"]
@@ -157,23 +398,94 @@ def update_charts(clickData, _, __, selected_indexes, selected_chart, selected_y
         selected_year_bar = dh.get_all_years()[0]
     # Click event
     elif clickData and "points" in clickData and len(clickData["points"]) > 0:
-        country_clicked = clickData["points"][0]["customdata"][0]
-        if selected_chart == "line":
+        # the clicked country is identified by its ISO3 location, the custom data only holds the values
+        country_clicked = dh.get_country_name(clickData["points"][0].get("location"))
+        if country_clicked is None:
+            pass
+        elif selected_chart == "line":
             if country_clicked in selected_countries_line:
+                toggled_position = selected_countries_line.index(country_clicked)
                 selected_countries_line.remove(country_clicked)
             else:
+                toggled_position = -1
                 selected_countries_line.append(country_clicked)
         elif selected_chart == "bar":
             selected_countries_bar = [country_clicked]
+            bar_clicked = True
+
+    #updating charts: only the chart on display, and only when something it shows has changed
+    # the hidden chart keeps its figure and is rebuilt by the chart selector when it is revealed again
+    line_chart = bar_chart = no_update
+    if selected_chart == "line" and toggled_position is not None and selected_indexes:
+        # a single country was toggled: only its traces are added or removed, the rest of the figure stays on the client
+        line_chart = Patch()
+        traces_per_country = len(selected_indexes)
+        if toggled_position >= 0:
+            for i in reversed(range(traces_per_country)):
+                del line_chart["data"][toggled_position * traces_per_country + i]
+            line_colors.pop(country_clicked, None)
+        else:
+            line_colors[country_clicked] = b.pick_line_color(line_colors.values())
+            line_chart["data"].extend(b.build_line_traces(country_clicked, line_colors[country_clicked], selected_indexes, dh))
+    elif selected_chart == "line" and (toggled_position is not None or ctx.triggered_id in LINE_CHART_TRIGGERS):
+        line_colors = b.get_line_colors(selected_countries_line)
+        line_chart = figure_cache.get(
+            "line_chart", dh.get_data_version(selected_indexes),
+            lambda: b.build_line_chart(selected_countries_line, selected_indexes, dh, line_colors),
+            countries=selected_countries_line, selected_indexes=selected_indexes, colors=line_colors
+        )
+    elif selected_chart == "bar" and (bar_clicked or ctx.triggered_id in BAR_CHART_TRIGGERS):
+        if static_figures:
+            bar_chart = static_figures.bar_chart(selected_countries_bar[0], selected_year_bar)
+        else:
+            bar_chart = BarChart(dh, selected_countries_bar, selected_year_bar)
+    return line_chart, bar_chart, selected_countries_line, selected_countries_bar, None, selected_year_bar, line_colors
+
+def BarChart(dh, countries, year):
+    return figure_cache.get(
+        "bar_chart", dh.get_data_version(),
+        lambda: b.build_bar_chart(countries, year, dh.get_all_indexes(), dh),
+        countries=countries, year=year
+    )
+
+# the inputs each chart depends on, a change of any other input leaves it as it is
+LINE_CHART_TRIGGERS = {"chart-selector", "reset-btn-line", "selected_indexes", "baseline-year", "normalization"}
+BAR_CHART_TRIGGERS = {"chart-selector", "reset-btn-bar", "year-selector-bar", "baseline-year", "normalization"}
+
+
+# readiness probe: only ready once every index is loaded, which serve.py does before forking the workers
+@app.server.route("/ready")
+def ready():
+    if static_figures or DataHandling.GetDataHandler().is_loaded():
+        return "ready"
+    return "loading", 503
+
+# the exported files as they are, for a cdn or any other client of the read-only deployment:
+# the json is sent pre-compressed, the server never compresses it again
+if static_figures:
+    @app.server.route("/static-figures/<path:name>")
+    def static_figure(name):
+        response = flask.send_from_directory(static_export_dir, name)
+        if name.endswith(".json.gz"):
+            response.headers["Content-Type"] = "application/json"
+            response.headers["Content-Encoding"] = "gzip"
+        return response
+
+
+# opt-in callback metrics on /metrics (and optionally a rolling log), nothing is wrapped unless DASH_METRICS is set
+if os.environ.get("DASH_METRICS"):
+    Instrumentation.Instrument(app, DataHandling.GetDataHandler(), b, log_path=os.environ.get("DASH_METRICS_LOG"))
 
-    #updating charts
-    if selected_chart == "line":
-        return b.build_line_chart(selected_countries_line, selected_indexes, merged_df), None, selected_countries_line, selected_countries_bar, None, selected_year_bar
-    elif selected_chart == "bar":
-        return None, b.build_bar_chart(selected_countries_bar, selected_year_bar, dh.get_all_indexes(), dh.get_df_by_name("all")), selected_countries_line, selected_countries_bar, None, selected_year_bar
-    else:
-        return None, None, selected_countries_line, selected_countries_bar, None, selected_year_bar
 
+def StartSourceWatcher():
+    watcher = DataHandling.SourceWatcher(interval=source_watch_interval, max_indexes=max_displayed_indexes)
+    watcher.start()
+    return watcher
 
 if __name__ == "__main__":
+    if not static_figures:
+        # the merged views of every allowed selection are built next to the server starting up
+        DataHandling.GetDataHandler().precompute_merged_views(max_displayed_indexes, background=True)
+        if watch_sources:
+            StartSourceWatcher()
     app.run(debug=False)
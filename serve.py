@@ -0,0 +1,52 @@
+import argparse
+import gc
+import os
+
+from gunicorn.app.base import BaseApplication
+
+# production entry point: the dash app under gunicorn with preforked workers
+# the data is loaded once in the master, the forked workers share its memory copy-on-write
+#   python serve.py --workers 4 --bind 0.0.0.0:8050
+
+class DashApplication(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # with preload_app this runs in the master, before any worker is forked
+        import main
+        # a static export (STATIC_EXPORT_DIR) needs no data at all
+        if main.static_figures is None:
+            dh = main.DataHandling.GetDataHandler()
+            dh.preload()
+            dh.precompute_merged_views(main.max_displayed_indexes)
+        # objects created so far are never collected, so the gc does not write to (and copy) the shared pages
+        gc.freeze()
+        return main.app.server
+
+def post_fork(server, worker):
+    # threads do not survive the fork, every worker polls the sources itself and publishes its own new versions
+    # the first worker to see a change rewrites the snapshot, the others find it up to date and only read it
+    import main
+    if main.watch_sources and main.static_figures is None:
+        main.StartSourceWatcher()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the dashboard with preforked workers")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--bind", default=os.environ.get("BIND", "0.0.0.0:8050"))
+    parser.add_argument("--timeout", type=int, default=60)
+    args = parser.parse_args()
+
+    DashApplication({
+        "bind": args.bind,
+        "workers": args.workers,
+        "timeout": args.timeout,
+        "preload_app": True,
+        "post_fork": post_fork,
+    }).run()
@@ -0,0 +1,12 @@
+import os
+import sys
+
+import pytest
+
+# the modules sit at the repository root and open their source csvs relative to it
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    monkeypatch.chdir(ROOT)
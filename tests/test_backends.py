@@ -0,0 +1,99 @@
+import base64
+import itertools
+import json
+
+import numpy as np
+import plotly.io as pio
+import pytest
+
+import Builder
+import DataHandling
+import FastBuilder
+
+# the graph_objects builders (Builder.py, the reference) against the dict builders (FastBuilder.py):
+# the same arguments have to give the same figure json once the typed arrays are decoded
+
+def DecodeFigureJson(value):
+    # figure json with the typed arrays plotly writes ({"dtype", "bdata"}) decoded to plain lists
+    if isinstance(value, dict):
+        if "bdata" in value and "dtype" in value:
+            array = np.frombuffer(base64.b64decode(value["bdata"]), dtype=value["dtype"])
+            return array.reshape([int(size) for size in value["shape"].split(",")]).tolist() if "shape" in value else array.tolist()
+        return {key: DecodeFigureJson(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [DecodeFigureJson(item) for item in value]
+    return value
+
+def FigureDifference(left, right, path="fig"):
+    # path of the first difference between two decoded figures, None when they are equivalent
+    # numbers are compared at float32 precision, which is what both backends carry
+    if isinstance(left, dict) and isinstance(right, dict):
+        for key in sorted(left.keys() | right.keys()):
+            if key not in left or key not in right:
+                return f"{path}.{key}"
+            difference = FigureDifference(left[key], right[key], f"{path}.{key}")
+            if difference:
+                return difference
+        return None
+    if isinstance(left, list) and isinstance(right, list):
+        if len(left) != len(right):
+            return f"{path} (length {len(left)} != {len(right)})"
+        for i, (left_item, right_item) in enumerate(zip(left, right)):
+            difference = FigureDifference(left_item, right_item, f"{path}[{i}]")
+            if difference:
+                return difference
+        return None
+    if isinstance(left, (int, float)) and isinstance(right, (int, float)) and not isinstance(left, bool) and not isinstance(right, bool):
+        return None if np.isclose(left, right, rtol=1e-6, atol=0, equal_nan=True) else path
+    # NaN/inf are null in plain json but kept as they are in the typed arrays, plotly.js treats both as missing
+    if {type(left), type(right)} == {float, type(None)}:
+        return None if not np.isfinite(left if left is not None else right) else path
+    return None if left == right else path
+
+def AssertSameFigure(build):
+    # build(builder) with both backends, including the serialization dash does
+    go_json = json.loads(pio.json.to_json_plotly(build(Builder)))
+    fast_json = json.loads(FastBuilder.to_json(build(FastBuilder)))
+    difference = FigureDifference(DecodeFigureJson(go_json), DecodeFigureJson(fast_json))
+    assert difference is None, f"the backends differ at {difference}"
+
+@pytest.fixture(scope="module")
+def dh():
+    dh = DataHandling.DataHandler()
+    dh.preload()
+    return dh
+
+@pytest.fixture(scope="module")
+def selection(dh):
+    indexes = dh.get_all_indexes()[:2]
+    return indexes, dh.get_merged_view(dh.get_merged_key(indexes)).years
+
+# every frame of every ordered pair: the first index is the choropleth and the second the bubbles,
+# so each index is checked in both roles and in every year
+@pytest.mark.parametrize("selected_indexes", [list(pair) for pair in itertools.permutations(DataHandling.INDEX_SOURCES, 2)], ids="+".join)
+def test_build_map_info(dh, selected_indexes):
+    years = dh.get_merged_view(dh.get_merged_key(selected_indexes)).years
+    AssertSameFigure(lambda builder: {"frames": builder.build_map_info(years, dh, selected_indexes)})
+
+def test_build_map(dh, selection):
+    indexes, years = selection
+    AssertSameFigure(lambda builder: builder.build_map(builder.build_map_info(years, dh, indexes), years))
+
+def test_build_map_lazy(dh, selection):
+    indexes, years = selection
+    AssertSameFigure(lambda builder: builder.build_map(builder.build_map_info(years[:1], dh, indexes), years, lazy=True))
+
+def test_build_map_empty(dh):
+    AssertSameFigure(lambda builder: builder.build_map(builder.build_map_info(), lazy=True))
+
+def test_build_map_frame_fixed_range(dh, selection):
+    indexes, years = selection
+    AssertSameFigure(lambda builder: builder.build_map_frame(years[0], dh, indexes, fixed_color_range=True))
+
+def test_build_line_chart(dh, selection):
+    indexes, _ = selection
+    AssertSameFigure(lambda builder: builder.build_line_chart(dh.all_countries[:10], indexes, dh))
+
+def test_build_bar_chart(dh, selection):
+    _, years = selection
+    AssertSameFigure(lambda builder: builder.build_bar_chart(dh.all_countries[:1], years[0], dh.get_all_indexes(), dh))
@@ -0,0 +1,118 @@
+import json
+from collections import Counter
+
+import pytest
+
+import DataHandling
+
+# builder invocations per user action, with the figure cache bypassed: every action goes through dash's callback
+# endpoint the way the browser sends it, one post per server callback the action fires; the index dropdown's
+# debounce is clientside, a burst of edits reaches the server as the single index_selection change counted here
+
+BUILDERS = ["build_map", "build_map_info", "build_map_frame", "build_line_chart", "build_line_traces", "build_bar_chart"]
+
+@pytest.fixture(scope="module")
+def main():
+    import main
+    main.DataHandling.GetDataHandler().preload()
+    # the first request sets up dash and builds the layout (the empty map), that is the page load, not an action
+    main.app.server.test_client().get("/_dash-layout")
+    return main
+
+@pytest.fixture
+def builds(main, monkeypatch):
+    # counts the calls of every builder of the active backend, the cache is emptied before each action
+    counts = Counter()
+    for name in BUILDERS:
+        def counted(*args, _build=getattr(main.b, name), _name=name, **kwargs):
+            counts[_name] += 1
+            return _build(*args, **kwargs)
+        monkeypatch.setattr(main.b, name, counted)
+    counts.reset = lambda: (counts.clear(), main.figure_cache.clear())
+    return counts
+
+def Callback(main, name):
+    # (output key, callback spec) of the server callback with this function name
+    for key, spec in main.app.callback_map.items():
+        callback = spec.get("callback")
+        if callback is not None and getattr(callback, "__name__", None) == name:
+            return key, spec
+    raise KeyError(name)
+
+def Post(client, main, name, values, changed):
+    # one request of the dash renderer: values holds "<id>.<property>" of every input and state
+    key, spec = Callback(main, name)
+    outputs = [{"id": output.split(".")[0], "property": output.split(".")[1].split("@")[0]} for output in key.strip(".").split("...")]
+    body = {
+        "output": key,
+        "outputs": outputs if len(outputs) > 1 else outputs[0],
+        "inputs": [{**item, "value": values.get(f"{item['id']}.{item['property']}")} for item in spec["inputs"]],
+        "state": [{**item, "value": values.get(f"{item['id']}.{item['property']}")} for item in spec["state"]],
+        "changedPropIds": [f"{prop_id}" for prop_id in changed],
+    }
+    response = client.post("/_dash-update-component", data=json.dumps(body), content_type="application/json")
+    assert response.status_code in (200, 204), response.data
+    return response.json["response"] if response.status_code == 200 else {}
+
+@pytest.fixture
+def page(main):
+    # the component values of a freshly loaded page, with the bar chart on display
+    dh = DataHandling.GetDataHandler()
+    return {
+        "index_selection.data": ["GDPValue", "BMI"],
+        "selected_indexes.data": ["GDPValue", "BMI"],
+        "merged_key.data": list(DataHandling.MakeMergedKey(["GDPValue", "BMI"])),
+        "baseline-year.value": dh.baseline_year,
+        "normalization.value": dh.normalization,
+        "chart-selector.value": "bar",
+        "year-selector-bar.value": 2010,
+        "reset-btn-line.n_clicks": 0,
+        "reset-btn-bar.n_clicks": 0,
+        "world-map.clickData": None,
+        "selected_countries_line.data": ["Denmark"],
+        "selected_countries_bar.data": ["Denmark"],
+        "line_colors.data": {},
+    }
+
+def ChangeIndexes(client, main, page, selected_indexes):
+    # the settled dropdown value: the selection stores, then the map and the charts that depend on them
+    page["index_selection.data"] = selected_indexes
+    stores = Post(client, main, "update_selected_indexes", page, ["index_selection.data"])
+    page["selected_indexes.data"] = stores["selected_indexes"]["data"]
+    page["merged_key.data"] = stores["merged_key"]["data"]
+    Post(client, main, "update_map", page, ["selected_indexes.data", "merged_key.data"])
+    Post(client, main, "update_charts", page, ["selected_indexes.data"])
+
+def test_indexes_change_with_bar_shown(main, builds, page):
+    # the map and its first frame, the bar chart shows every index and is left as it is
+    builds.reset()
+    ChangeIndexes(main.app.server.test_client(), main, page, ["HDIValue", "DIIndex"])
+    assert builds == Counter(build_map=1, build_map_frame=1)
+
+def test_indexes_change_with_line_shown(main, builds, page):
+    # the map and its first frame, the line chart with the traces of its one country
+    page["chart-selector.value"] = "line"
+    builds.reset()
+    ChangeIndexes(main.app.server.test_client(), main, page, ["HDIValue", "DIIndex"])
+    assert builds == Counter(build_map=1, build_map_frame=1, build_line_chart=1, build_line_traces=1)
+
+def test_bar_year_change(main, builds, page):
+    builds.reset()
+    page["year-selector-bar.value"] = 2012
+    Post(main.app.server.test_client(), main, "update_charts", page, ["year-selector-bar.value"])
+    assert builds == Counter(build_bar_chart=1)
+
+@pytest.mark.parametrize("changed", ["year-selector-bar.value", "reset-btn-bar.n_clicks"])
+def test_bar_inputs_with_line_shown(main, builds, page, changed):
+    # inputs of the hidden bar chart leave the line chart on display alone
+    page["chart-selector.value"] = "line"
+    page["reset-btn-bar.n_clicks"] = 1
+    builds.reset()
+    Post(main.app.server.test_client(), main, "update_charts", page, [changed])
+    assert sum(builds.values()) == 0
+
+def test_switch_to_line(main, builds, page):
+    page["chart-selector.value"] = "line"
+    builds.reset()
+    Post(main.app.server.test_client(), main, "update_charts", page, ["chart-selector.value"])
+    assert builds == Counter(build_line_chart=1, build_line_traces=1)
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import DataHandling
+
+# the loaders as they were before the chunked ingest, up to their scaling (the scores are computed by the
+# normalization schemes since), with the code column kept; two differences to the chunked loaders are expected:
+# the country names are resolved to ISO3 codes (names without a code are dropped) and the nominal indexes are
+# deflated when loaded instead of by the loader (only the Big Mac price was deflated, to 2024)
+
+def ReferenceDemocracyIndex():
+    df = pd.read_csv("DemocracyIndex.csv")
+    df = df.rename(columns={"REF_AREA_LABEL": "country", "REF_AREA": "code", "OBS_VALUE": "DIIndex", "TIME_PERIOD": "year"})
+    return df[['country', 'code', 'year',"DIIndex"]]
+
+def ReferenceBigMacIndex():
+    df = pd.read_csv("BigmacPrice.csv")
+    df = df.rename(columns={"name": "country", "dollar_price": "price"})
+    df["year"] = pd.to_datetime(df["date"]).dt.year
+    df = df.groupby(["country", "year"], as_index=False)["price"].mean()
+
+    cpi_map = dict(zip(range(2000, 2025), [
+        195.3, 201.6, 207.3, 215.3, 214.5, 218.1, 224.9, 229.6,
+        233.0, 237.0, 240.0, 245.1, 251.1, 255.7, 258.8, 264.9,
+        271.0, 276.7, 281.9, 287.5, 292.7, 296.8, 300.8, 306.0, 313.7
+    ]))
+    df['BMI'] = df['price'] * (cpi_map[2024] / df['year'].map(cpi_map))
+    return df[["country", "year", "BMI"]]
+
+def ReferenceGDPCountry():
+    df = pd.read_csv("GDP.csv")
+    df = df.melt(id_vars=["Country"], var_name="year", value_name="Value")
+    df["year"] = pd.to_numeric(df["year"], errors="coerce").astype("Int64")
+    df = df.dropna(subset=["Value"])
+    df = df[df["year"] >= 2000]
+    df.rename(columns={"Country": "country", "Value": "GDPValue"}, inplace=True)
+    df['GDPValue'] = pd.to_numeric(df['GDPValue'], errors='coerce')
+    return df
+
+def ReferenceGDPCapita():
+    df = pd.read_csv("GDPCapita.csv")
+    df.columns = df.columns.str.strip()
+    year_cols = [col for col in df.columns if col.isdigit()]
+    df = df.melt(
+        id_vars=['Country Name', 'Country Code', 'Indicator Name', 'Indicator Code'],
+        value_vars=year_cols,
+        var_name='year',
+        value_name='value'
+    )
+    df['year'] = pd.to_numeric(df['year'], errors='coerce').astype('Int64')
+    df['value'] = pd.to_numeric(df['value'], errors='coerce')
+    df = df.dropna(subset=['value'])
+    df = df[df["year"] >= 2000]
+    return df.rename(columns={"Country Name": "country", "Country Code": "code", "value": "GDPCapitaValue"})
+
+def ReferenceHDI():
+    df = pd.read_csv("hdr-data.csv")
+    df = df.rename(columns={"value": "HDIValue", "countryIsoCode": "code"})
+    df = df[["country", "code", "year", "HDIValue"]]
+    df = df[df["year"] >= 2000]
+    return df.dropna(subset=["HDIValue"])
+
+def ReferenceLifeExpectancy():
+    df = pd.read_csv("life-expectancy-unwpp.csv")
+    df = df.rename(columns={
+        "Entity": "country",
+        "Code": "code",
+        "Year": "year",
+        "Life expectancy - Sex: all - Age: 0 - Variant: estimates": "LifeExpectancy"})
+    df = df[["country", "code", "year", "LifeExpectancy"]]
+    df = df[df["year"] >= 2000]
+    return df.dropna(subset=["LifeExpectancy"])
+
+REFERENCE_LOADERS = {
+    "BMI": ReferenceBigMacIndex,
+    "DIIndex": ReferenceDemocracyIndex,
+    "GDPValue": ReferenceGDPCountry,
+    "GDPCapitaValue": ReferenceGDPCapita,
+    "HDIValue": ReferenceHDI,
+    "LifeExpectancy": ReferenceLifeExpectancy,
+}
+
+def ReferenceFrame(name):
+    # the reference rows keyed like the chunked loaders: (ISO3 code, year), rows without a code dropped
+    df = REFERENCE_LOADERS[name]()
+    df = df.assign(country=DataHandling.ResolveCountries(df["country"], df["code"] if "code" in df else None))
+    df = df[df["country"].notna()]
+    return SortedRows(df["country"], df["year"], df[name])
+
+def LoadedFrame(name):
+    # the chunked loader's rows, the Big Mac price deflated to 2024 like the reference loader did
+    loader, _ = DataHandling.INDEX_SOURCES[name]
+    df = loader()
+    values = df[name].to_numpy(np.float64)
+    if name == "BMI":
+        values = DataHandling.LoadDeflator().deflate(values, df["year"].to_numpy(), 2024)
+    return SortedRows(df["country"], df["year"], values)
+
+def SortedRows(countries, years, values):
+    # (country, year, value) sorted on all three: the aggregates World and North America are in
+    # DemocracyIndex.csv twice per year (two breakdowns), the loaders keep both rows
+    df = pd.DataFrame({"country": np.asarray(countries, dtype=str), "year": np.asarray(years, dtype=np.int64), "value": np.asarray(values, dtype=np.float64)})
+    return df.sort_values(["country", "year", "value"], ignore_index=True)
+
+@pytest.mark.parametrize("name", list(DataHandling.INDEX_SOURCES))
+def test_chunked_loader_matches_reference(name):
+    expected = ReferenceFrame(name)
+    loaded = LoadedFrame(name)
+
+    pd.testing.assert_frame_equal(loaded[["country", "year"]], expected[["country", "year"]])
+    np.testing.assert_allclose(loaded["value"], expected["value"], rtol=1e-6)
+
+@pytest.mark.parametrize("name", list(DataHandling.INDEX_SOURCES))
+def test_chunked_loader_dtypes(name):
+    loader, _ = DataHandling.INDEX_SOURCES[name]
+    df = loader()
+
+    assert list(df.columns) == ["country", "year", name]
+    assert isinstance(df["country"].dtype, pd.CategoricalDtype)
+    assert df["year"].dtype == np.int16
+    assert df[name].dtype == np.float32
+    assert df["year"].min() >= DataHandling.FIRST_YEAR
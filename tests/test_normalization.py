@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+import DataHandling
+
+@pytest.fixture(scope="module")
+def dh():
+    dh = DataHandling.DataHandler()
+    dh.preload()
+    return dh
+
+def test_data_version_tells_default_from_the_same_scheme_by_name(dh):
+    # GDP is log-max under both, but the legend of an explicitly chosen scheme differs
+    explicit = dh.variant(normalization=DataHandling.INDEX_NORMALIZATIONS["GDPValue"])
+    assert explicit.get_normalization("GDPValue") == dh.get_normalization("GDPValue")
+    assert explicit.get_data_version(["GDPValue"]) != dh.get_data_version(["GDPValue"])
+
+# every scale of the dropdown keeps the scores on the 0 - 10 axes of the charts (sizes of the bubbles, bar heights)
+@pytest.mark.parametrize("normalization", ["default", "log-max", "min-max", "z-score", "percentile"])
+def test_scores_within_the_chart_range(dh, normalization):
+    variant = dh.variant(normalization=normalization)
+    for name in dh.get_all_indexes():
+        scores = variant.get_df_by_name(name)[name].to_numpy()
+        scores = scores[~np.isnan(scores)]
+        assert scores.min() >= 0 and scores.max() <= 10 + 1e-5, (name, scores.min(), scores.max())